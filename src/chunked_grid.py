@@ -0,0 +1,158 @@
+import utils
+
+CHUNK_SIZE = 32
+
+class GridRow:
+    def __init__(self, grid, y):
+        self.grid = grid
+        self.y = y
+
+    def __len__(self):
+        return self.grid.width
+
+    def __getitem__(self, x):
+        return self.grid.node_at(x, self.y)
+
+    def __iter__(self):
+        for x in range(self.grid.width):
+            yield self.grid.node_at(x, self.y)
+
+class ChunkedGrid:
+    """
+    Sparse grid of nodes stored in CHUNK_SIZE x CHUNK_SIZE tiles. Only filled cells are stored and tiles without
+    any are not allocated. Indexing with grid[y][x] mirrors the old list of lists, empty cells come back as
+    throwaway empty nodes, so anything that writes to a cell has to go through create first.
+
+    Args:
+        width (int): grid width in cells.
+        height (int): grid height in cells.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+        # storage coordinates are logical coordinates plus the offset, so rows and columns can be
+        # added or removed at the top and left without moving any node
+        self.offset_x = 0
+        self.offset_y = 0
+        self.chunks = {}
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        return GridRow(self, y)
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield GridRow(self, y)
+
+    def chunk_key(self, x, y):
+        sx, sy = x + self.offset_x, y + self.offset_y
+        return (sx//CHUNK_SIZE, sy//CHUNK_SIZE), (sx%CHUNK_SIZE, sy%CHUNK_SIZE)
+
+    def get(self, x, y):
+        key, local = self.chunk_key(x, y)
+        chunk = self.chunks.get(key)
+        if chunk == None:
+            return None
+        return chunk.get(local)
+
+    def node_at(self, x, y):
+        node = self.get(x, y)
+        if node == None:
+            node = utils.Node(utils.CELL_EMPTY)
+            node.id = y*self.width + x
+        return node
+
+    def create(self, x, y):
+        key, local = self.chunk_key(x, y)
+        if not key in self.chunks:
+            self.chunks[key] = {}
+        chunk = self.chunks[key]
+        if not local in chunk:
+            chunk[local] = utils.Node(utils.CELL_EMPTY)
+            chunk[local].id = y*self.width + x
+        return chunk[local]
+
+    def release(self, x, y):
+        key, local = self.chunk_key(x, y)
+        chunk = self.chunks.get(key)
+        if chunk == None or not local in chunk:
+            return
+        node = chunk[local]
+        if node.type != utils.CELL_EMPTY or len(node.neighbors) > 0:
+            return
+        del chunk[local]
+        if len(chunk) == 0:
+            del self.chunks[key]
+
+    def items(self,):
+        for (cx, cy), chunk in self.chunks.items():
+            for (lx, ly), node in chunk.items():
+                yield cx*CHUNK_SIZE + lx - self.offset_x, cy*CHUNK_SIZE + ly - self.offset_y, node
+
+    def items_in(self, min_x, max_x, min_y, max_y):
+        if min_x >= max_x or min_y >= max_y:
+            return
+        (lcx, lcy), _ = self.chunk_key(min_x, min_y)
+        (hcx, hcy), _ = self.chunk_key(max_x-1, max_y-1)
+        for cy in range(lcy, hcy+1):
+            for cx in range(lcx, hcx+1):
+                chunk = self.chunks.get((cx, cy))
+                if chunk == None:
+                    continue
+                for (lx, ly), node in chunk.items():
+                    x, y = cx*CHUNK_SIZE + lx - self.offset_x, cy*CHUNK_SIZE + ly - self.offset_y
+                    if x >= min_x and x < max_x and y >= min_y and y < max_y:
+                        yield x, y, node
+
+    def move_nodes(self, moved, dx, dy):
+        for x, y, node in moved:
+            key, local = self.chunk_key(x, y)
+            del self.chunks[key][local]
+            if len(self.chunks[key]) == 0:
+                del self.chunks[key]
+        for x, y, node in moved:
+            key, local = self.chunk_key(x+dx, y+dy)
+            if not key in self.chunks:
+                self.chunks[key] = {}
+            self.chunks[key][local] = node
+
+    def insert_col(self, col_idx):
+        if col_idx == 0:
+            self.offset_x -= 1
+        elif col_idx < self.width:
+            self.move_nodes([item for item in self.items() if item[0] >= col_idx], 1, 0)
+        self.width += 1
+
+    def delete_col(self, col_idx):
+        # the column has to be empty already
+        if col_idx == 0:
+            self.offset_x += 1
+        elif col_idx < self.width-1:
+            self.move_nodes([item for item in self.items() if item[0] > col_idx], -1, 0)
+        self.width -= 1
+
+    def insert_row(self, row_idx):
+        if row_idx == 0:
+            self.offset_y -= 1
+        elif row_idx < self.height:
+            self.move_nodes([item for item in self.items() if item[1] >= row_idx], 0, 1)
+        self.height += 1
+
+    def delete_row(self, row_idx):
+        # the row has to be empty already
+        if row_idx == 0:
+            self.offset_y += 1
+        elif row_idx < self.height-1:
+            self.move_nodes([item for item in self.items() if item[1] > row_idx], 0, -1)
+        self.height -= 1
+
+    def set_ids(self,):
+        old_to_new = {}
+        for x, y, node in self.items():
+            new_id = y*self.width + x
+            old_to_new[node.id] = new_id
+            node.id = new_id
+        return old_to_new
@@ -5,6 +5,8 @@ GRID_COLOR = (0.8, 0.8, 0.8)
 EDGE_EMPTY = (0.8, 0.8, 0.8)
 EDGE_FULL = (0, 63.0/255.0, 92.0/255.0)
 EDGE_SELECTED = (92/255.0, 0.0/255.0, 63.0/255.0)
+EDGE_BRIDGE = (220.0/255.0, 53.0/255.0, 69.0/255.0)
+CUT_VOXEL = (220.0/255.0, 53.0/255.0, 69.0/255.0)
 
 EMPTY_VOXEL = (244.0/255.0, 245.0/255.0, 247.0/255.0)
 RIGID_VOXEL = (0.15, 0.15, 0.15)
@@ -13,5 +15,15 @@ ACT_H_VOXEL = (0.99215, 0.55816, 0.24274)
 ACT_V_VOXEL = (0.42768, 0.68678, 0.84095)
 FIXED_VOXEL = (0.0, 0.0, 0.0)
 
+# indexed by cell type
+VOXEL_COLORS = (EMPTY_VOXEL, RIGID_VOXEL, SOFT_VOXEL, ACT_H_VOXEL, ACT_V_VOXEL, FIXED_VOXEL)
+
+REGION_SELECTED = (92/255.0, 0.0/255.0, 63.0/255.0, 0.2)
+SYMMETRY_AXIS = (92/255.0, 0.0/255.0, 63.0/255.0, 0.6)
+
+# indexed by utils.DIFF_*
+DIFF_COLORS = (None, (40/255.0, 167/255.0, 69/255.0, 0.55), (220/255.0, 53/255.0, 69/255.0, 0.55), (255/255.0, 193/255.0, 7/255.0, 0.55))
+DIFF_CONNECTION = (39/255.0, 128/255.0, 227/255.0, 0.9)
+
 HOVER_LIGHT = (0.1, 0.1, 0.1, 0.1)
 HOVER_DARK = (0.9, 0.9, 0.9, 0.1)
\ No newline at end of file
@@ -0,0 +1,334 @@
+import asyncio
+import json
+import os
+import queue
+import secrets
+import socket
+import tempfile
+import threading
+import time
+import warnings
+
+import utils
+import data_manager
+
+DEFAULT_PORT = 7878
+SOCKET_NAME = 'evogym_design_tool.sock'
+
+class CommandError(Exception):
+    pass
+
+def get_default_path():
+    # a directory only this user can enter, so nobody else can reach the socket even before it is chmodded
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if directory == None:
+        directory = os.path.join(tempfile.gettempdir(), f'evogym_design_tool-{os.getuid()}')
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    stat = os.stat(directory)
+    if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+        raise OSError(f'{directory} is not private to this user')
+    return os.path.join(directory, SOCKET_NAME)
+
+class CommandServer:
+    """
+    Lets scripts drive a running editor over a local socket. Each line a client sends is a JSON batch,
+    {"id": ..., "commands": [{"cmd": ...}, ...]} or a single {"cmd": ...}, answered by one JSON line. The asyncio loop
+    only moves lines between sockets and queues on a background thread, batches are run by the editor loop through
+    run_batches so they never race the renderer.
+
+    The unix socket can only be opened by the user running the editor. Any local program, and any web page through
+    the browser, can reach a TCP port, so there the first line of every client has to be {"token": ...} with the
+    token the server was started with. Files are only read and written inside save_path.
+
+    Args:
+        path (str): unix socket path. (default = None, a socket in the user's runtime directory)
+        port (int): TCP port to listen on instead, 0 picks a free one. (default = None)
+        host (str): address of the TCP port, keep it local. (default = '127.0.0.1')
+        save_path (str): directory load and save are restricted to. (default = 'exported')
+    """
+    def __init__(self, path=None, port=None, host='127.0.0.1', save_path='exported'):
+        self.host = host
+        self.port = port
+        self.path = path
+        if port == None and path == None:
+            self.path = get_default_path()
+        self.token = secrets.token_hex(16) if port != None else None
+        self.save_path = save_path
+
+        self.batches = queue.Queue()
+        self.writers = {}
+        self.client_count = 0
+        self.address = None
+        self.error = None
+
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error != None:
+            raise self.error
+
+    def run(self,):
+        asyncio.set_event_loop(self.loop)
+        try:
+            if self.port == None:
+                self.remove_stale_socket()
+                server = self.loop.run_until_complete(asyncio.start_unix_server(self.handle, path=self.path))
+                os.chmod(self.path, 0o600)
+            else:
+                server = self.loop.run_until_complete(asyncio.start_server(self.handle, self.host, self.port))
+            self.address = server.sockets[0].getsockname()
+        except OSError as e:
+            self.error = e
+            self.ready.set()
+            return
+        self.ready.set()
+
+        self.loop.run_forever()
+
+        # drop the clients before the loop goes away, so their handlers can clean up
+        server.close()
+        for writer in list(self.writers.values()):
+            writer.close()
+        tasks = asyncio.all_tasks(self.loop)
+        if len(tasks) > 0:
+            self.loop.run_until_complete(asyncio.wait(tasks, timeout=1.0))
+        self.loop.run_until_complete(server.wait_closed())
+        self.loop.close()
+        if self.port == None:
+            os.unlink(self.path)
+
+    def remove_stale_socket(self,):
+        # left behind by an editor that did not shut down cleanly, a live one is left alone
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX)
+        try:
+            probe.connect(self.path)
+        except ConnectionRefusedError:
+            os.unlink(self.path)
+            return
+        finally:
+            probe.close()
+        raise OSError(f'another editor is listening on {self.path}')
+
+    async def authenticate(self, reader, client):
+        line = await reader.readline()
+        try:
+            token = json.loads(line).get('token')
+        except (ValueError, AttributeError):
+            token = None
+        if not isinstance(token, str) or not secrets.compare_digest(token, self.token):
+            self.write(client, {'ok': False, 'error': 'the first line has to be {"token": ...}'})
+            return False
+        self.write(client, {'ok': True})
+        return True
+
+    async def handle(self, reader, writer):
+        self.client_count += 1
+        client = self.client_count
+        self.writers[client] = writer
+        try:
+            if self.token != None and not await self.authenticate(reader, client):
+                return
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip() == b'':
+                    continue
+                try:
+                    message = json.loads(line)
+                except ValueError as e:
+                    self.write(client, {'ok': False, 'error': f'invalid JSON: {e}'})
+                    continue
+                self.batches.put((client, message))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self.writers[client]
+            writer.close()
+
+    def write(self, client, message):
+        # runs on the loop thread, replies to clients that already left are dropped
+        if client in self.writers:
+            self.writers[client].write((json.dumps(message) + '\n').encode())
+
+    def write_all(self, message):
+        for client in list(self.writers):
+            self.write(client, message)
+
+    def send(self, client, message):
+        self.loop.call_soon_threadsafe(self.write, client, message)
+
+    def broadcast(self, message):
+        self.loop.call_soon_threadsafe(self.write_all, message)
+
+    def run_batches(self, env, viewer, budget=0.008):
+        """
+        Runs queued batches on the calling thread, each one completely, until the time budget is used up. The rest
+        wait for the next frame.
+
+        Args:
+            env (Env): editor state.
+            viewer (Viewer): editor window.
+            budget (float): seconds to spend before leaving batches for the next call. (default = 0.008)
+
+        Returns:
+            bool: whether any batch ran.
+        """
+        start = time.perf_counter()
+        ran = False
+        while time.perf_counter() - start < budget:
+            try:
+                client, message = self.batches.get_nowait()
+            except queue.Empty:
+                break
+            self.send(client, run_batch(env, viewer, message, self.save_path))
+            ran = True
+        return ran
+
+    def objects_changed(self, objects):
+        # object listener, so edits made by hand are streamed too
+        self.broadcast({'event': 'objects_changed', 'objects': [obj.name for obj in objects.values()]})
+
+    def close(self,):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=1.0)
+
+def get_int(value, what):
+    # floats or booleans would end up as cell indices in the undo history, which only stores integers
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise CommandError(f'{what} has to be an integer, got {value!r}')
+    return value
+
+def get_index(env, cell):
+    if not isinstance(cell, list) or len(cell) != 2:
+        raise CommandError(f'a cell is [x, y], got {cell!r}')
+    x, y = get_int(cell[0], 'x'), get_int(cell[1], 'y')
+    if not env.is_valid(x, y):
+        raise CommandError(f'cell ({x}, {y}) is outside the {env.grid_width}x{env.grid_height} grid')
+    return y*env.grid_width + x
+
+def describe_objects(env):
+    described = []
+    for object_id, obj in env.objects.items():
+        xs = [node_id%env.grid_width for node_id in obj.nodes]
+        ys = [node_id//env.grid_width for node_id in obj.nodes]
+        described.append({'id': object_id, 'name': obj.name, 'voxels': len(obj.nodes), 'bbox': [min(xs), min(ys), max(xs), max(ys)]})
+    return described
+
+def get_path(save_path, file_name):
+    # only plain names inside the save directory, completed like the names typed into the GUI
+    if not isinstance(file_name, str) or os.path.basename(file_name) != file_name or file_name in ['', '.', '..']:
+        raise CommandError(f'file has to be a name inside {save_path}, got {file_name!r}')
+    if not '.' in file_name:
+        file_name += '.json'
+    return os.path.join(save_path, file_name)
+
+def run_command(env, viewer, command, save_path):
+    name = command.get('cmd')
+
+    if name == 'load':
+        path = get_path(save_path, command['file'])
+        loaded_state = data_manager.DataManager().load(path)
+        if loaded_state == None:
+            raise CommandError(f'could not read {path}')
+        env.set_state(loaded_state)
+        viewer.load(path)
+        return {'grid_width': env.grid_width, 'grid_height': env.grid_height}
+
+    if name == 'save':
+        env.save(get_path(save_path, command['file']))
+        return None
+
+    if name == 'paint':
+        # cells are [x, y, type] in editor coordinates, y down
+        for x, y, value in command['cells']:
+            if not get_int(value, 'cell type') in range(utils.CELL_EMPTY, utils.CELL_FIXED+1):
+                raise CommandError(f'unknown cell type {value}')
+            env.paint_node(get_index(env, [x, y]), value)
+        return None
+
+    if name == 'connect':
+        a, b = get_index(env, command['a']), get_index(env, command['b'])
+        if abs(command['a'][0] - command['b'][0]) + abs(command['a'][1] - command['b'][1]) != 1:
+            raise CommandError('only neighboring cells can be connected')
+        if env.get_node_by_index(a).type == utils.CELL_EMPTY or env.get_node_by_index(b).type == utils.CELL_EMPTY:
+            raise CommandError('both cells need a voxel to be connected')
+        env.set_connection(a, b, command.get('connected', True))
+        return None
+
+    if name == 'resize':
+        width, height = get_int(command['width'], 'width'), get_int(command['height'], 'height')
+        if width < 1 or height < 1:
+            raise CommandError(f'the grid needs at least one cell, got {width}x{height}')
+        env.change_gs(width, height)
+        return None
+
+    if name == 'undo' or name == 'redo':
+        # earlier commands of the batch become their own step first
+        env.end_batch()
+        return {'done': (env.undo() if name == 'undo' else env.redo()) != None}
+
+    if name == 'camera':
+        viewer.set_camera(command.get('x'), command.get('y'), command.get('zoom'))
+        return None
+
+    if name == 'objects':
+        env.end_batch()
+        return {'objects': describe_objects(env)}
+
+    if name == 'types':
+        return {'types': utils.get_types(env.grid).tolist()}
+
+    raise CommandError(f'unknown command {name}')
+
+def run_batch(env, viewer, message, save_path):
+    """
+    Runs every command of a batch and relabels objects once at the end, so a batch is a single edit and a single
+    undo step however many commands it has. A failing command stops the batch, the ones before it stay applied.
+
+    Args:
+        env (Env): editor state.
+        viewer (Viewer): editor window.
+        message (dict): the batch as sent by the client.
+        save_path (str): directory files are loaded from and saved to.
+
+    Returns:
+        dict: reply with the result of every command that ran.
+    """
+    commands = message.get('commands', [message]) if isinstance(message, dict) else None
+    if not isinstance(commands, list):
+        return {'ok': False, 'error': 'a batch is an object with a list of commands'}
+
+    old_size = (env.grid_width, env.grid_height)
+    reply = {'id': message.get('id'), 'ok': True, 'results': []}
+    for command_index, command in enumerate(commands):
+        try:
+            reply['results'].append(run_command(env, viewer, command, save_path))
+            if command.get('cmd') == 'load':
+                # the viewer was reset by the load, it only has to follow resizes after it
+                old_size = (env.grid_width, env.grid_height)
+        except (CommandError, AttributeError, KeyError, TypeError, ValueError) as e:
+            reply['ok'] = False
+            reply['error'] = f'command {command_index}: {e}'
+            break
+
+    # the client always gets its reply, and a failure here must not escape into the editor loop
+    try:
+        env.end_batch()
+        if (env.grid_width, env.grid_height) != old_size:
+            viewer.change_gs(env.grid_width, env.grid_height)
+    except Exception as e:
+        reply['ok'] = False
+        reply['error'] = f'ending the batch: {e}'
+    return reply
+
+def start_server(path=None, port=None, save_path='exported'):
+    try:
+        return CommandServer(path=path, port=port, save_path=save_path)
+    except OSError as e:
+        warnings.warn(f'Could not start the command server: {e}')
+        return None
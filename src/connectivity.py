@@ -0,0 +1,65 @@
+import utils
+
+def find_cut_points(grid, nodes):
+    """
+    Finds the connections and voxels whose removal would split an object in two, using Tarjan's lowlink
+    search with an explicit stack so large objects don't hit the recursion limit. Runs in O(voxels + connections).
+
+    Args:
+        grid: grid holding the object.
+        nodes (dict): node ids of the object.
+
+    Returns:
+        (dict, dict): bridge edge ids (see utils.pair_to_edge) and articulation node ids.
+    """
+    grid_width = len(grid[0])
+
+    discovered = {}
+    low = {}
+    bridges = {}
+    articulation = {}
+    count = 0
+
+    for root in nodes:
+        if root in discovered:
+            continue
+
+        discovered[root] = low[root] = count
+        count += 1
+        root_children = 0
+        stack = [(root, None, iter(utils.get_node_by_index(grid, root).neighbors))]
+
+        while len(stack) > 0:
+            node, parent, neighbors = stack[-1]
+
+            descended = False
+            for nei in neighbors:
+                if nei == parent:
+                    continue
+                if nei in discovered:
+                    low[node] = min(low[node], discovered[nei])
+                    continue
+                discovered[nei] = low[nei] = count
+                count += 1
+                stack.append((nei, node, iter(utils.get_node_by_index(grid, nei).neighbors)))
+                descended = True
+                break
+            if descended:
+                continue
+
+            stack.pop()
+            if parent == None:
+                continue
+
+            low[parent] = min(low[parent], low[node])
+            if low[node] > discovered[parent]:
+                bridges[utils.pair_to_edge(parent, node, grid_width)] = True
+            if parent == root:
+                root_children += 1
+            elif low[node] >= discovered[parent]:
+                articulation[parent] = True
+
+        if root_children > 1:
+            articulation[root] = True
+
+    return bridges, articulation
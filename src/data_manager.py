@@ -3,6 +3,8 @@ import utils
 import os
 import warnings
 
+import numpy as np
+
 class DataManager():
     def __init__(self):
         pass
@@ -41,7 +43,7 @@ class DataManager():
                     index_curr = utils.flip_y(obj_data['indices'][i], grid_width, grid_height)
                     type_curr = obj_data['types'][i]
                     curr_object.nodes[index_curr] = True
-                    utils.get_node_by_index(grid, index_curr).type = type_curr
+                    grid.create(index_curr%grid_width, index_curr//grid_width).type = type_curr
 
                     # set node neighbors
                     index_raw = obj_data['indices'][i]
@@ -87,34 +89,199 @@ class DataManager():
         return grid_width, grid_height, grid, objects, node_to_object, unnamed_obj_count
 
 
+    def load_arrays(self, file_path):
+        if not os.path.exists(file_path):
+            return None
+
+        try:
+            with open(file_path, 'r') as infile:
+                state = json.load(infile)
+
+            grid_width = state['grid_width']
+            grid_height = state['grid_height']
+
+            types = np.zeros((grid_height, grid_width), dtype=np.uint8)
+            labels = np.full((grid_height, grid_width), -1, dtype=np.int32)
+            conn_h = np.zeros((grid_height, grid_width-1), dtype=bool)
+            conn_v = np.zeros((grid_height-1, grid_width), dtype=bool)
+            names = []
+
+            for name, obj_data in state['objects'].items():
+
+                # assert lists of same length
+                assert len(obj_data['indices'])  == len(obj_data['types'])
+                assert len(obj_data['indices'])  == len(obj_data['neighbors'])
+
+                indices = np.array(obj_data['indices'], dtype=np.int64)
+                x, y = indices%grid_width, (grid_height-1) - indices//grid_width
+                types[y, x] = obj_data['types']
+                labels[y, x] = len(names)
+                names.append(name)
+
+                a = [int(index) for index, neis in obj_data['neighbors'].items() for nei in neis]
+                b = [nei for index, neis in obj_data['neighbors'].items() for nei in neis]
+                a, b = np.array(a, dtype=np.int64), np.array(b, dtype=np.int64)
+                ax, ay = a%grid_width, (grid_height-1) - a//grid_width
+                bx, by = b%grid_width, (grid_height-1) - b//grid_width
+
+                horizontal = (ay == by) & (np.abs(ax - bx) == 1)
+                conn_h[ay[horizontal], np.minimum(ax, bx)[horizontal]] = True
+                vertical = (ax == bx) & (np.abs(ay - by) == 1)
+                conn_v[np.minimum(ay, by)[vertical], ax[vertical]] = True
+
+        except Exception as e:
+            warnings.warn("Could not load file. Please check that your file has not been corrupted.")
+            return None
+
+        return types, conn_h, conn_v, labels, names
+
     def save(self, file_path, grid, objects):
+        self.export_world(file_path, grid, objects)
+
+    def export_world(self, file_path, grid, objects, crop=False):
+        """
+        Writes objects in the EvoGym world JSON format, which is also the editor's own format. Objects are written
+        to disk one at a time instead of building the whole document first, so large worlds never exist twice in
+        memory. The file is replaced in one step once it is complete.
+
+        Args:
+            file_path (str): path of the JSON file.
+            grid (ChunkedGrid): editor grid.
+            objects (dict): objects to write, keyed by object id.
+            crop (bool): whether to shrink the grid to the bounding box of the objects, e.g. to save a single
+                object for WorldObject.from_json. (default = False)
+        """
         grid_height = len(grid)
         grid_width = len(grid[0])
 
-        out = {
-            'grid_width': grid_width,
-            'grid_height': grid_height,
-            'objects': None}
-
-        objects_dict = {}
-        for object_id, obj in objects.items():
-            indices = []
-            types = []
-            neighbors = {}
-            for idx in obj.nodes:
-                indices.append(utils.flip_y(idx, grid_width, grid_height))
-                types.append(utils.get_node_by_index(grid, idx).type)
-
-                ns = list(utils.get_node_by_index(grid, idx).neighbors.keys())
-                for i in range(len(ns)):
-                    ns[i] = utils.flip_y(ns[i], grid_width, grid_height)
-                neighbors[utils.flip_y(idx, grid_width, grid_height)] = ns
-
-            obj_dict = {'indices': indices, 'types': types, 'neighbors': neighbors}
-
-            objects_dict[obj.name] = obj_dict
-        out['objects'] = objects_dict
-
-        
-        with open(file_path, 'w') as outfile:
-            json.dump(out, outfile, indent=4)
\ No newline at end of file
+        min_x, min_y, max_x, max_y = 0, 0, grid_width-1, grid_height-1
+        if crop and any(len(obj.nodes) > 0 for obj in objects.values()):
+            xs = [idx%grid_width for obj in objects.values() for idx in obj.nodes]
+            ys = [idx//grid_width for obj in objects.values() for idx in obj.nodes]
+            min_x, min_y, max_x, max_y = min(xs), min(ys), max(xs), max(ys)
+        out_width, out_height = max_x-min_x+1, max_y-min_y+1
+
+        # EvoGym counts rows from the bottom
+        def to_index(idx):
+            return (out_height-1 - (idx//grid_width - min_y))*out_width + (idx%grid_width - min_x)
+
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'w') as outfile:
+            outfile.write(f'{{\n    "grid_width": {out_width},\n    "grid_height": {out_height},\n    "objects": {{')
+            separator = '\n'
+            for object_id, obj in objects.items():
+                indices = []
+                types = []
+                neighbors = {}
+                for idx in obj.nodes:
+                    node = utils.get_node_by_index(grid, idx)
+                    indices.append(to_index(idx))
+                    types.append(node.type)
+                    neighbors[to_index(idx)] = [to_index(nei) for nei in node.neighbors]
+
+                obj_dict = {'indices': indices, 'types': types, 'neighbors': neighbors}
+                outfile.write(f'{separator}        {json.dumps(obj.name)}: {json.dumps(obj_dict)}')
+                separator = ',\n'
+            outfile.write('\n    }\n}\n')
+        os.replace(tmp_path, file_path)
+
+    def export_robot(self, file_path, grid, nodes):
+        """
+        Writes voxels as an EvoGym robot, an npz file holding the structure as arr_0 and the connections as arr_1,
+        the same layout np.savez(path, structure, connections) gives in EvoGym.
+
+        Args:
+            file_path (str): path of the npz file.
+            grid (ChunkedGrid): editor grid.
+            nodes (dict): ids of the nodes making up the robot, cropped to their bounding box.
+
+        Returns:
+            bool: whether anything was written.
+        """
+        grid_width = len(grid[0])
+        if len(nodes) == 0:
+            return False
+
+        xs = [idx%grid_width for idx in nodes]
+        ys = [idx//grid_width for idx in nodes]
+        min_x, min_y = min(xs), min(ys)
+        width, height = max(xs)-min_x+1, max(ys)-min_y+1
+
+        # robot rows count from the top like the editor's, so only the bounding box offset changes
+        def to_index(idx):
+            return (idx//grid_width - min_y)*width + (idx%grid_width - min_x)
+
+        structure = np.zeros((height, width), dtype=np.int64)
+        connections = []
+        for idx in nodes:
+            node = utils.get_node_by_index(grid, idx)
+            structure[idx//grid_width - min_y, idx%grid_width - min_x] = node.type
+            for nei in node.neighbors:
+                if idx < nei and nei in nodes:
+                    connections.append((to_index(idx), to_index(nei)))
+        connections = np.array(sorted(connections), dtype=np.int64).reshape(-1, 2).T
+
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'wb') as outfile:
+            np.savez(outfile, structure, connections)
+        os.replace(tmp_path, file_path)
+        return True
+
+    def import_robot(self, file_path):
+        """
+        Reads an EvoGym robot npz file. Without a connections array every pair of neighboring voxels is connected,
+        as EvoGym does for robots saved without one.
+
+        Returns:
+            tuple: same as load, with one object per connected part named after the file.
+        """
+        if not os.path.exists(file_path):
+            return None
+
+        try:
+            with np.load(file_path) as data:
+                structure = np.asarray(data['arr_0'], dtype=np.int64)
+                connections = data['arr_1'] if 'arr_1' in data else None
+
+            assert structure.ndim == 2
+            assert np.all((structure >= utils.CELL_EMPTY) & (structure <= utils.CELL_FIXED))
+            grid_height, grid_width = structure.shape
+
+            grid = utils.make_blank_grid(grid_width, grid_height)
+            utils.set_ids(grid)
+            ys, xs = np.nonzero(structure)
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                grid.create(x, y).type = int(structure[y, x])
+
+            if connections is None:
+                filled = structure != utils.CELL_EMPTY
+                h_ys, h_xs = np.nonzero(filled[:, :-1] & filled[:, 1:])
+                v_ys, v_xs = np.nonzero(filled[:-1, :] & filled[1:, :])
+                a = np.concatenate([h_ys*grid_width + h_xs, v_ys*grid_width + v_xs])
+                b = np.concatenate([h_ys*grid_width + h_xs + 1, (v_ys+1)*grid_width + v_xs])
+            else:
+                connections = np.asarray(connections, dtype=np.int64).reshape(2, -1)
+                a, b = connections[0], connections[1]
+
+            for index_a, index_b in zip(a.tolist(), b.tolist()):
+                node_a, node_b = utils.get_node_by_index(grid, index_a), utils.get_node_by_index(grid, index_b)
+                assert node_a.type != utils.CELL_EMPTY and node_b.type != utils.CELL_EMPTY
+                assert (abs(index_b - index_a) == 1 and index_a//grid_width == index_b//grid_width) or abs(index_b - index_a) == grid_width
+                node_a.neighbors[index_b] = True
+                node_b.neighbors[index_a] = True
+
+            name = os.path.splitext(os.path.basename(file_path))[0]
+            objects = utils.get_objects(grid)
+            for object_id, obj in objects.items():
+                obj.name = name if object_id == 0 else f'{name}_{object_id+1}'
+
+            node_to_object = {}
+            for object_id, obj in objects.items():
+                for node_id in obj.nodes:
+                    node_to_object[node_id] = object_id
+
+        except Exception as e:
+            warnings.warn("Could not load robot. Please check that the file is an EvoGym robot saved with np.savez.")
+            return None
+
+        return grid_width, grid_height, grid, objects, node_to_object, 1
@@ -0,0 +1,137 @@
+import argparse
+import time
+
+import numpy as np
+
+import utils
+import data_manager
+
+MAX_LISTED = 20
+# object pairs counted with a dense table, designs with more objects fall back to sorting
+MAX_DENSE_PAIRS = 1 << 22
+
+def pad_arrays(loaded_arrays, width, height):
+    # files number their rows from the bottom, so designs stay aligned on the bottom left corner
+    types, conn_h, conn_v, labels, names = loaded_arrays
+    top, right = height - types.shape[0], width - types.shape[1]
+
+    padded_conn_h = np.zeros((height, max(0, width-1)), dtype=bool)
+    padded_conn_h[top:, :conn_h.shape[1]] = conn_h
+    padded_conn_v = np.zeros((max(0, height-1), width), dtype=bool)
+    padded_conn_v[top:, :conn_v.shape[1]] = conn_v
+    return (np.pad(types, ((top, 0), (0, right))), padded_conn_h, padded_conn_v,
+        np.pad(labels, ((top, 0), (0, right)), constant_values=-1))
+
+class DesignDiff:
+    """
+    Everything that changed between two designs, computed with whole array comparisons. Both designs are aligned on
+    their bottom left corner and padded to the larger size.
+
+    Args:
+        old_arrays (tuple): (types, conn_h, conn_v, labels, names) of the old design, see DataManager.load_arrays.
+        new_arrays (tuple): same for the new design.
+    """
+    def __init__(self, old_arrays, new_arrays):
+        self.width = max(old_arrays[0].shape[1], new_arrays[0].shape[1])
+        self.height = max(old_arrays[0].shape[0], new_arrays[0].shape[0])
+        old_types, old_conn_h, old_conn_v, old_labels = pad_arrays(old_arrays, self.width, self.height)
+        new_types, new_conn_h, new_conn_v, new_labels = pad_arrays(new_arrays, self.width, self.height)
+        old_names, new_names = old_arrays[4], new_arrays[4]
+
+        # cells holds one DIFF_* value per cell in editor orientation
+        old_filled, new_filled = old_types != utils.CELL_EMPTY, new_types != utils.CELL_EMPTY
+        both = old_filled & new_filled
+        self.cells = (new_filled > old_filled)*np.uint8(utils.DIFF_ADDED)
+        self.cells += (old_filled > new_filled)*np.uint8(utils.DIFF_REMOVED)
+        self.cells += (both & (old_types != new_types))*np.uint8(utils.DIFF_RETYPED)
+
+        # connections only count between voxels present in both designs, the rest follow from the cells
+        self.conn_h = (old_conn_h != new_conn_h) & both[:, :-1] & both[:, 1:]
+        self.conn_v = (old_conn_v != new_conn_v) & both[:-1, :] & both[1:, :]
+        self.conn_added = int((self.conn_h & new_conn_h).sum() + (self.conn_v & new_conn_v).sum())
+        self.conn_removed = int((self.conn_h & old_conn_h).sum() + (self.conn_v & old_conn_v).sum())
+
+        # objects are matched by the cells they share, label -1 lands in row or column 0 and is dropped
+        columns = len(new_names) + 1
+        if (len(old_names) + 1)*columns <= MAX_DENSE_PAIRS:
+            keys = (old_labels.astype(np.int64) + 1)*columns + (new_labels + 1)
+            overlap = np.bincount(keys.ravel(), minlength=(len(old_names) + 1)*columns).reshape(-1, columns)
+            old_label_list, new_label_list = np.nonzero(overlap[1:, 1:])
+        else:
+            shared = (old_labels >= 0) & (new_labels >= 0)
+            pairs = np.unique(old_labels[shared].astype(np.int64)*columns + new_labels[shared])
+            old_label_list, new_label_list = pairs//columns, pairs%columns
+
+        old_matches, new_matches = {}, {}
+        for old_label, new_label in zip(old_label_list.tolist(), new_label_list.tolist()):
+            old_matches.setdefault(old_label, []).append(new_label)
+            new_matches.setdefault(new_label, []).append(old_label)
+
+        self.objects_added = [new_names[label] for label in range(len(new_names)) if not label in new_matches]
+        self.objects_removed = [old_names[label] for label in range(len(old_names)) if not label in old_matches]
+        self.objects_renamed = []
+        self.objects_split = []
+        self.objects_merged = []
+        for old_label, matches in old_matches.items():
+            if len(matches) > 1:
+                self.objects_split.append((old_names[old_label], [new_names[label] for label in matches]))
+            elif len(new_matches[matches[0]]) == 1 and old_names[old_label] != new_names[matches[0]]:
+                self.objects_renamed.append((old_names[old_label], new_names[matches[0]]))
+        for new_label, matches in new_matches.items():
+            if len(matches) > 1:
+                self.objects_merged.append(([old_names[label] for label in matches], new_names[new_label]))
+
+    def is_empty(self,):
+        return (not self.cells.any() and not self.conn_h.any() and not self.conn_v.any() and
+            len(self.objects_added) + len(self.objects_removed) + len(self.objects_renamed) + len(self.objects_split) + len(self.objects_merged) == 0)
+
+    def get_summary(self,):
+        """
+        Returns:
+            list: report lines, cells are given as x, y in editor coordinates.
+        """
+        lines = []
+        for kind, name in [(utils.DIFF_ADDED, 'added'), (utils.DIFF_REMOVED, 'removed'), (utils.DIFF_RETYPED, 'retyped')]:
+            ys, xs = np.nonzero(self.cells == kind)
+            if len(xs) > 0:
+                cells = ' '.join(f'({x},{y})' for x, y in zip(xs[:MAX_LISTED].tolist(), ys[:MAX_LISTED].tolist()))
+                lines.append(f'{len(xs)} voxels {name}: {cells}' + (' ...' if len(xs) > MAX_LISTED else ''))
+        if self.conn_added > 0 or self.conn_removed > 0:
+            lines.append(f'{self.conn_added} connections added, {self.conn_removed} removed')
+        for name in self.objects_added:
+            lines.append(f'object added: {name}')
+        for name in self.objects_removed:
+            lines.append(f'object removed: {name}')
+        for old_name, new_name in self.objects_renamed:
+            lines.append(f'object renamed: {old_name} -> {new_name}')
+        for old_name, new_names in self.objects_split:
+            lines.append(f'object split: {old_name} -> {", ".join(new_names)}')
+        for old_names, new_name in self.objects_merged:
+            lines.append(f'objects merged: {", ".join(old_names)} -> {new_name}')
+        return lines
+
+def main():
+    parser = argparse.ArgumentParser(description='Report what changed between two design files.')
+    parser.add_argument('old', help='old design file')
+    parser.add_argument('new', help='new design file')
+    args = parser.parse_args()
+
+    dm = data_manager.DataManager()
+    old_arrays, new_arrays = dm.load_arrays(args.old), dm.load_arrays(args.new)
+    for path, loaded_arrays in [(args.old, old_arrays), (args.new, new_arrays)]:
+        if loaded_arrays == None:
+            print(f'Could not read {path}.')
+            return
+
+    start = time.perf_counter()
+    diff = DesignDiff(old_arrays, new_arrays)
+    elapsed = time.perf_counter() - start
+
+    if diff.is_empty():
+        print('No differences.')
+    for line in diff.get_summary():
+        print(line)
+    print(f'Compared {diff.width}x{diff.height} cells in {elapsed*1000:.1f} ms.')
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,14 @@ from json import load
 from colors import ACT_H_VOXEL, ACT_V_VOXEL, EMPTY_VOXEL, FIXED_VOXEL, RIGID_VOXEL, SOFT_VOXEL
 import utils
 import data_manager
+import history
+import object_stats
+import similarity_index
+
+import numpy as np
 
 class Env:
-    def __init__(self):
+    def __init__(self, history_records=250000):
         self.grid_width = 10
         self.grid_height = 10
 
@@ -13,28 +18,67 @@ class Env:
 
         self.mode = utils.VOXELS
         self.selector = utils.CELL_SOFT
+        self.tool = utils.BRUSH
+
+        # edits are repeated across a mirror line at x or y = axis, None puts it at the grid center
+        self.symmetry = utils.SYMMETRY_NONE
+        self.symmetry_axis_x = None
+        self.symmetry_axis_y = None
+
+        self.region_start = None
+        self.region_end = None
+        self.pattern = None
+
+        # clipboard holds (types, conn_h, conn_v, labels, names) like DataManager.load_arrays
+        self.clipboard = None
+        self.paste_armed = False
+        self.ignore_drag = False
+        self.selection_rect = None
+        self.move_object_id = None
+        self.pending_names = {}
 
         self.objects = {}
         self.node_to_object = {}
         self.unnamed_obj_count = 1
 
+        # bumped whenever an object's nodes or connections change
+        self.object_version_count = 0
+        self.dirty_nodes = {}
+
+        # ObjectStats by object id, kept up to date by every edit. Voxels added or changed since the last relabel
+        # are not counted anywhere yet, update_objects hands them to their new object
+        self.object_stats = {}
+        self.stats_pending = {}
+
+        # called with the objects dict whenever objects are relabeled, loaded or renamed
+        self.object_listeners = []
+
+        # called with the grid at the end of every step or batch that changed a voxel or connection
+        self.commit_listeners = []
+        self.grid_changed = False
+
         self.hovered_object_id = None
         self.selected_object_id = None
 
         self.just_altered = None
+        self.altered_nodes = {}
         self.need_to_update_objects = False
 
         self.dm = data_manager.DataManager()
+        self.history = history.History(self.get_cell_state, history_records, self.get_cell_name)
 
-    def update(self, hovered, selected, mouse_pressed, mouse_held, key_presses, mode_data):
+    def update(self, hovered, selected, mouse_pressed, mouse_held, mouse_released, stroke, key_presses, mode_data):
         
         self.need_to_update_objects = False
         self.just_altered = None
+        self.altered_nodes = {}
 
         if mouse_pressed:
-            self.handle_mouse_press(hovered)
+            self.handle_mouse_press(hovered, stroke)
         if mouse_held:
-            self.handle_mouse_held(hovered)
+            self.handle_mouse_held(hovered, stroke)
+        if mouse_released:
+            self.handle_mouse_release()
 
         # self.handle_key_presses(key_presses)
         self.update_mode(mode_data)
@@ -42,23 +86,127 @@ class Env:
         if self.need_to_update_objects:
             self.update_objects()
 
+        # a drag is a single undo step
+        if not mouse_held:
+            self.history.commit()
+            self.notify_commit()
+
         self.update_active_objects(hovered, selected)
 
+    def end_batch(self,):
+        # edits made outside of update, e.g. by the command server, are relabeled once for the whole batch
+        if self.need_to_update_objects:
+            self.update_objects()
+            self.need_to_update_objects = False
+        self.history.commit()
+        self.notify_commit()
+
     def load(self, file_name):
-        loaded_state = self.dm.load(file_name)
+        self.set_state(self.dm.load(file_name))
+
+    def set_state(self, loaded_state):
+        # loaded_state is what DataManager.load returns, it may have been parsed on another thread
         if loaded_state == None:
             return
 
         self.grid_width, self.grid_height, self.grid, self.objects, self.node_to_object, self.unnamed_obj_count = loaded_state
+        self.bump_object_versions()
+        self.history.clear()
+        self.grid_changed = True
         self.hovered_object_id = None
         self.selected_object_id = None
+        self.selection_rect = None
+        self.notify_objects()
 
     def save(self, file_name):
         self.dm.save(file_name, self.grid, self.objects)
 
+    def export_object(self, file_name):
+        # the selected object on its own, or the whole world cropped to its contents
+        objects = self.objects
+        if self.selected_object_id != None:
+            objects = {self.selected_object_id: self.objects[self.selected_object_id]}
+        if len(objects) == 0:
+            return False
+        self.dm.export_world(file_name, self.grid, objects, crop=True)
+        return True
+
+    def export_robot(self, file_name):
+        if self.selected_object_id != None:
+            nodes = self.objects[self.selected_object_id].nodes
+        else:
+            nodes = {node_id: True for obj in self.objects.values() for node_id in obj.nodes}
+        return self.dm.export_robot(file_name, self.grid, nodes)
+
+    def import_robot(self, file_name):
+        loaded_state = self.dm.import_robot(file_name)
+        self.set_state(loaded_state)
+        return loaded_state != None
+
     def update_mode(self, mode_data):
         self.mode = mode_data['mode']
         self.selector = mode_data['selector']
+        self.tool = mode_data['tool']
+        self.symmetry = mode_data['symmetry']
+        self.symmetry_axis_x, self.symmetry_axis_y = mode_data['symmetry_axis']
+
+    def get_symmetry_axes(self,):
+        axis_x, axis_y = None, None
+        if self.symmetry in [utils.SYMMETRY_X, utils.SYMMETRY_XY]:
+            axis_x = self.symmetry_axis_x if self.symmetry_axis_x != None else (self.grid_width-1)/2
+        if self.symmetry in [utils.SYMMETRY_Y, utils.SYMMETRY_XY]:
+            axis_y = self.symmetry_axis_y if self.symmetry_axis_y != None else (self.grid_height-1)/2
+        # cells only mirror onto cells across whole or half cell positions
+        if axis_x != None:
+            axis_x = round(axis_x*2)/2
+        if axis_y != None:
+            axis_y = round(axis_y*2)/2
+        return axis_x, axis_y
+
+    def get_mirror_cells(self, index):
+        # always in the same order, so the mirrors of two cells line up
+        axis_x, axis_y = self.get_symmetry_axes()
+        x, y = index%self.grid_width, index//self.grid_width
+
+        cells = []
+        if axis_x != None:
+            cells.append((int(2*axis_x) - x, y))
+        if axis_y != None:
+            cells.append((x, int(2*axis_y) - y))
+        if axis_x != None and axis_y != None:
+            cells.append((int(2*axis_x) - x, int(2*axis_y) - y))
+        return cells
+
+    def get_mirrors(self, index):
+        mirrors = {}
+        for x, y in self.get_mirror_cells(index):
+            mirror = y*self.grid_width + x
+            if mirror != index and self.is_valid(x, y):
+                mirrors[mirror] = True
+        return list(mirrors.keys())
+
+    def paint_symmetric(self, index, value):
+        self.paint_node(index, value)
+        for mirror in self.get_mirrors(index):
+            self.paint_node(mirror, value)
+
+    def toggle_symmetric(self, a_id, b_id):
+        self.toggle_connection(a_id, b_id)
+        connected = a_id in self.get_node_by_index(b_id).neighbors
+
+        # mirrored edges take the new state of the clicked one, edges on the axis mirror onto themselves
+        done = {utils.pair_to_edge(a_id, b_id, self.grid_width): True}
+        for (ax, ay), (bx, by) in zip(self.get_mirror_cells(a_id), self.get_mirror_cells(b_id)):
+            if not self.is_valid(ax, ay) or not self.is_valid(bx, by):
+                continue
+            ma, mb = ay*self.grid_width + ax, by*self.grid_width + bx
+            edge = utils.pair_to_edge(ma, mb, self.grid_width)
+            if edge in done:
+                continue
+            done[edge] = True
+            if self.get_node_by_index(ma).type == utils.CELL_EMPTY or self.get_node_by_index(mb).type == utils.CELL_EMPTY:
+                continue
+            self.set_connection(ma, mb, connected)
 
     def update_active_objects(self, hovered, selected):
 
@@ -66,33 +214,36 @@ class Env:
         if hovered != None and hovered[0] == 'node' and utils.get_node_by_index(self.grid, hovered[2]).type != utils.CELL_EMPTY:
             self.hovered_object_id = self.node_to_object[hovered[2]]
         if hovered != None and hovered[0] == 'edge':
-            a, b = tuple(hovered[1].split())
-            a, b = int(a), int(b)
-            self.hovered_object_id = self.node_to_object[a]
+            self.hovered_object_id = self.node_to_object[hovered[1]//2]
 
         self.selected_object_id = None
         if selected != None and selected[0] == 'node' and utils.get_node_by_index(self.grid, selected[2]).type != utils.CELL_EMPTY:
             self.selected_object_id = self.node_to_object[selected[2]]
         if selected != None and selected[0] == 'edge':
-            a, b = tuple(selected[1].split())
-            a, b = int(a), int(b)
-            self.selected_object_id = self.node_to_object[a]
+            self.selected_object_id = self.node_to_object[selected[1]//2]
 
     def update_objects(self,):
 
         new_objects = utils.get_objects(self.grid)
 
         for object_id, obj in new_objects.items():
+            for node_id in obj.nodes:
+                if node_id in self.pending_names:
+                    obj.name = self.pending_names[node_id]
+                    break
             for node_id in obj.nodes:
                 if obj.name != None:
                     break
-                for curr_obj_id, curr_obj in self.objects.items():
-                    if node_id in curr_obj.nodes:
-                        obj.name = curr_obj.name
-                        break
+                if node_id in self.node_to_object:
+                    obj.name = self.objects[self.node_to_object[node_id]].name
             if obj.name == None:
                 obj.name = f'new_object_{self.unnamed_obj_count}'
                 self.unnamed_obj_count += 1
+            obj.version = self.get_object_version(obj)
+
+        self.update_object_stats(new_objects)
+        self.dirty_nodes = {}
+        self.pending_names = {}
 
         self.objects = {}
         for object_id, obj in new_objects.items():
@@ -103,6 +254,122 @@ class Env:
             for node_id in obj.nodes:
                 self.node_to_object[node_id] = object_id
 
+        self.notify_objects()
+
+    def update_object_stats(self, new_objects):
+
+        # voxels each new object got from each old object, counted ones only
+        overlap = {}
+        for object_id, obj in new_objects.items():
+            for node_id in obj.nodes:
+                if node_id in self.stats_pending or not node_id in self.node_to_object:
+                    continue
+                key = (self.node_to_object[node_id], object_id)
+                overlap[key] = overlap.get(key, 0) + 1
+
+        # old stats go to the new object that got most of their voxels, objects that merged merge their stats
+        heirs = {}
+        for (old_id, object_id), count in overlap.items():
+            if old_id in self.object_stats and count > heirs.get(old_id, (0, None))[0]:
+                heirs[old_id] = (count, object_id)
+        new_stats = {}
+        old_to_stats = {}
+        for old_id in sorted(heirs, key=lambda old_id: -self.object_stats[old_id].total):
+            object_id = heirs[old_id][1]
+            if object_id in new_stats:
+                new_stats[object_id].merge(self.object_stats[old_id])
+            else:
+                new_stats[object_id] = self.object_stats[old_id]
+            old_to_stats[old_id] = new_stats[object_id]
+
+        # only voxels that are new, or that split off from the object they were counted in, are moved one by one
+        for object_id, obj in new_objects.items():
+            stats = new_stats.setdefault(object_id, object_stats.ObjectStats())
+            for node_id in obj.nodes:
+                old_id = None if node_id in self.stats_pending else self.node_to_object.get(node_id)
+                if old_id in heirs and heirs[old_id][1] == object_id:
+                    continue
+                x, y = node_id%self.grid_width, node_id//self.grid_width
+                node_type = self.get_node_by_index(node_id).type
+                stats.add(x, y, node_type)
+                if old_id in old_to_stats:
+                    old_to_stats[old_id].remove(x, y, node_type)
+
+        self.object_stats = new_stats
+        self.stats_pending = {}
+
+    def add_object_listener(self, func):
+        self.object_listeners.append(func)
+
+    def notify_objects(self,):
+        for func in self.object_listeners:
+            func(self.objects)
+
+    def add_commit_listener(self, func):
+        self.commit_listeners.append(func)
+
+    def notify_commit(self,):
+        if not self.grid_changed:
+            return
+        self.grid_changed = False
+        for func in self.commit_listeners:
+            func(self.grid)
+
+    def rename_object(self, object_id, name):
+        self.objects[object_id].name = name
+        self.notify_objects()
+
+    def get_object_stats(self, object_id):
+        # only missing right after a load or resize, until the next relabel
+        if not object_id in self.object_stats:
+            self.object_stats[object_id] = object_stats.make_stats(self.grid, self.objects[object_id].nodes)
+        return self.object_stats[object_id].get_summary()
+
+    def get_arrays(self,):
+        grid_width, grid_height = len(self.grid[0]), len(self.grid)
+        conn_h, conn_v = utils.get_connections(self.grid)
+
+        # same layout as DataManager.load_arrays, so the editor contents can be compared with a file
+        labels = np.full((grid_height, grid_width), -1, dtype=np.int32)
+        object_labels, names = {}, []
+        for object_id, obj in self.objects.items():
+            object_labels[object_id] = len(names)
+            names.append(obj.name)
+        # node ids are row-major indices, so the labels are scattered in one go
+        node_ids = np.fromiter(self.node_to_object.keys(), dtype=np.int64, count=len(self.node_to_object))
+        labels.ravel()[node_ids] = np.fromiter((object_labels[object_id] for object_id in self.node_to_object.values()),
+            dtype=np.int32, count=len(self.node_to_object))
+        return utils.get_types(self.grid), conn_h, conn_v, labels, names
+
+    def get_features(self,):
+        conn_h, conn_v = utils.get_connections(self.grid)
+        return similarity_index.get_features(utils.get_types(self.grid), conn_h, conn_v)
+
+    def get_object_version(self, obj):
+
+        # an object keeps its version only if it is untouched since the last update
+        for node_id in self.dirty_nodes:
+            if node_id in obj.nodes:
+                return self.new_object_version()
+
+        node_id = next(iter(obj.nodes))
+        if node_id in self.node_to_object:
+            old_obj = self.objects[self.node_to_object[node_id]]
+            if old_obj.nodes.keys() == obj.nodes.keys():
+                return old_obj.version
+        return self.new_object_version()
+
+    def new_object_version(self,):
+        self.object_version_count += 1
+        return self.object_version_count
+
+    def bump_object_versions(self,):
+        for object_id, obj in self.objects.items():
+            obj.version = self.new_object_version()
+        self.dirty_nodes = {}
+        self.object_stats = {}
+        self.stats_pending = {}
+
     # def handle_key_presses(self, key_presses):
     #     if key_presses['z']:
     #         self.selector = utils.CELL_EMPTY
@@ -140,6 +407,9 @@ class Env:
 
         self.hovered_object_id = None
         self.selected_object_id = None
+        self.selection_rect = None
+
+        self.history.commit()
 
         # print(self.grid_width, self.grid_height)
 
@@ -147,13 +417,13 @@ class Env:
 
         # print(f'Removing col {col_idx}')
 
-        for y in range(self.grid_height):
-            if self.grid[y][col_idx].type != utils.CELL_EMPTY:
-                # print('Removing: ', self.grid[y][col_idx].id)
-                self.remove_node(self.grid[y][col_idx].id)
+        for x, y, node in list(self.grid.items_in(col_idx, col_idx+1, 0, self.grid_height)):
+            if node.type != utils.CELL_EMPTY:
+                # print('Removing: ', node.id)
+                self.remove_node(node.id)
                 self.update_objects()
-        for y in range(self.grid_height):
-            del self.grid[y][col_idx]
+        self.history.record_op(history.REMOVE_COL, col_idx)
+        self.grid.delete_col(col_idx)
 
         if with_cleanup:    
             self.grid_height = len(self.grid)
@@ -164,8 +434,8 @@ class Env:
 
         # print(f'Adding col {col_idx}')
 
-        for y in range(self.grid_height):
-            self.grid[y].insert(col_idx, utils.Node(0))
+        self.history.record_op(history.ADD_COL, col_idx)
+        self.grid.insert_col(col_idx)
 
         if with_cleanup:    
             self.grid_height = len(self.grid)
@@ -177,12 +447,13 @@ class Env:
     
         # print(f'Removing row {row_idx}')
 
-        for x in range(self.grid_width):
-            if self.grid[row_idx][x].type != utils.CELL_EMPTY:
-                # print('Removing: ', self.grid[row_idx][x].id)
-                self.remove_node(self.grid[row_idx][x].id)
+        for x, y, node in list(self.grid.items_in(0, self.grid_width, row_idx, row_idx+1)):
+            if node.type != utils.CELL_EMPTY:
+                # print('Removing: ', node.id)
+                self.remove_node(node.id)
                 self.update_objects()
-        del self.grid[row_idx]
+        self.history.record_op(history.REMOVE_ROW, row_idx)
+        self.grid.delete_row(row_idx)
 
         if with_cleanup:    
             self.grid_height = len(self.grid)
@@ -193,9 +464,8 @@ class Env:
 
         # print(f'Add row {row_idx}')
 
-        self.grid.insert(row_idx, [])
-        for x in range(self.grid_width):
-            self.grid[row_idx].append(utils.Node(0))
+        self.history.record_op(history.ADD_ROW, row_idx)
+        self.grid.insert_row(row_idx)
 
         if with_cleanup:    
             self.grid_height = len(self.grid)
@@ -204,26 +474,15 @@ class Env:
 
     def update_indices(self,):
         
-        # get mapping
-        utils.set_old_ids(self.grid)
-        utils.set_ids(self.grid)
-
-        old_to_new = {}
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                old_to_new[self.grid[y][x].old_id] = self.grid[y][x].id
-
-        disp = []
-        for key, value in old_to_new.items():
-            disp.append((key, value))
+        # get mapping, only filled cells are stored so this is O(filled cells)
+        old_to_new = utils.set_ids(self.grid)
 
         # update neighbors
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                neighbors_copy = self.grid[y][x].neighbors.copy()
-                self.grid[y][x].neighbors = {}
-                for neigh in neighbors_copy:
-                    self.grid[y][x].neighbors[old_to_new[neigh]] = True 
+        for x, y, node in self.grid.items():
+            neighbors_copy = node.neighbors.copy()
+            node.neighbors = {}
+            for neigh in neighbors_copy:
+                node.neighbors[old_to_new[neigh]] = True 
 
         # update objects
         for object_id, obj in self.objects.items():
@@ -237,41 +496,426 @@ class Env:
         for object_id, obj in self.objects.items():
             for node_id in obj.nodes:
                 self.node_to_object[node_id] = object_id
+
+        # every index moved, so no cached geometry is valid anymore
+        self.bump_object_versions()
+        self.grid_changed = True
         
-    def handle_mouse_press(self, hovered):
+    def handle_mouse_press(self, hovered, stroke):
+
+        if self.paste_armed:
+            if len(stroke) > 0:
+                self.paste(stroke[0])
+            self.paste_armed = False
+            self.ignore_drag = True
+            return
+
+        if self.mode == utils.SELECT and len(stroke) > 0:
+            self.region_start = stroke[0]
+            self.region_end = stroke[0]
+            self.selection_rect = None
+            # dragging the selected object moves it, dragging anywhere else selects a rectangle
+            if self.selected_object_id != None and self.node_to_object.get(stroke[0]) == self.selected_object_id:
+                self.move_object_id = self.selected_object_id
+
+        if self.mode == utils.VOXELS and len(stroke) > 0:
+            if self.tool == utils.RECTANGLE:
+                self.region_start = stroke[0]
+                self.region_end = stroke[0]
+            if self.tool == utils.FLOOD:
+                self.flood_paint(stroke[0], self.selector)
+            if self.tool == utils.STAMP:
+                self.stamp_pattern(stroke[0])
 
         if hovered == None:
             return
 
         if self.mode == utils.EDGES and hovered[0] == 'edge':
-            a, b = tuple(hovered[1].split())
-            a, b = int(a), int(b)
-            self.toggle_connection(a, b)
+            a, b = utils.edge_to_pair(hovered[1], self.grid_width)
+            self.toggle_symmetric(a, b)
             self.just_altered = hovered
 
-    def handle_mouse_held(self, hovered):
-        
-        if hovered == None:
+    def handle_mouse_held(self, hovered, stroke):
+
+        if self.ignore_drag:
             return
 
-        if self.mode == utils.VOXELS and hovered[0] == 'node':
-            node = self.get_node_by_index(hovered[2])
+        if self.region_start != None and len(stroke) > 0:
+            self.region_end = stroke[-1]
+
+        if self.mode == utils.VOXELS and self.tool == utils.BRUSH:
+            for index in stroke:
+                self.paint_symmetric(index, self.selector)
+
+            # keep the painted voxel under the cursor selected
+            if hovered != None and hovered[0] == 'node' and hovered[2] in self.altered_nodes and self.selector != utils.CELL_EMPTY:
+                self.just_altered = hovered
+
+    def handle_mouse_release(self,):
+
+        self.ignore_drag = False
+
+        if self.region_start != None:
+            if self.mode == utils.VOXELS and self.tool == utils.RECTANGLE:
+                self.fill_rect(self.region_start, self.region_end, self.selector)
+            if self.mode == utils.SELECT and self.move_object_id != None:
+                x0, y0 = self.region_start%self.grid_width, self.region_start//self.grid_width
+                x1, y1 = self.region_end%self.grid_width, self.region_end//self.grid_width
+                if (x0 != x1 or y0 != y1) and self.move_object(self.move_object_id, x1-x0, y1-y0):
+                    node = self.get_node_by_index(self.region_end)
+                    if node.type != utils.CELL_EMPTY:
+                        self.just_altered = ('node', node, node.id, node.type)
+            elif self.mode == utils.SELECT and self.region_start != self.region_end:
+                self.selection_rect = self.get_region()
+            self.region_start = None
+            self.region_end = None
+            self.move_object_id = None
+
+    def get_region(self,):
+        if self.region_start != None and self.move_object_id == None:
+            if self.mode == utils.SELECT or (self.mode == utils.VOXELS and self.tool == utils.RECTANGLE):
+                x0, y0 = self.region_start%self.grid_width, self.region_start//self.grid_width
+                x1, y1 = self.region_end%self.grid_width, self.region_end//self.grid_width
+                return (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        return self.selection_rect
+
+    def extract_region(self, x0, y0, x1, y1, object_ids=None):
+        height, width = y1-y0+1, x1-x0+1
+
+        types = np.zeros((height, width), dtype=np.uint8)
+        labels = np.full((height, width), -1, dtype=np.int32)
+        conn_h = np.zeros((height, width-1), dtype=bool)
+        conn_v = np.zeros((height-1, width), dtype=bool)
+        names = []
+        object_to_label = {}
+
+        for i in range(height):
+            for j in range(width):
+                node = self.grid.node_at(x0+j, y0+i)
+                object_id = self.node_to_object.get(node.id)
+                if node.type == utils.CELL_EMPTY or object_id == None:
+                    continue
+                if object_ids != None and not object_id in object_ids:
+                    continue
+                if not object_id in object_to_label:
+                    object_to_label[object_id] = len(names)
+                    names.append(self.objects[object_id].name)
+                types[i][j] = node.type
+                labels[i][j] = object_to_label[object_id]
+
+        # only keep links between captured cells
+        for i in range(height):
+            for j in range(width):
+                if types[i][j] == utils.CELL_EMPTY:
+                    continue
+                node = self.grid.node_at(x0+j, y0+i)
+                if j+1 < width and types[i][j+1] != utils.CELL_EMPTY and node.id+1 in node.neighbors:
+                    conn_h[i][j] = True
+                if i+1 < height and types[i+1][j] != utils.CELL_EMPTY and node.id+self.grid_width in node.neighbors:
+                    conn_v[i][j] = True
+
+        return types, conn_h, conn_v, labels, names
+
+    def get_object_rect(self, object_id):
+        xs = [index%self.grid_width for index in self.objects[object_id].nodes]
+        ys = [index//self.grid_width for index in self.objects[object_id].nodes]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def copy_selection(self,):
+        if self.selection_rect != None:
+            self.clipboard = self.extract_region(*self.selection_rect)
+        elif self.selected_object_id != None:
+            object_id = self.selected_object_id
+            self.clipboard = self.extract_region(*self.get_object_rect(object_id), {object_id: True})
+        else:
+            return False
 
-            if self.selector == utils.CELL_EMPTY:
-                if node.type != utils.CELL_EMPTY:
-                    self.remove_node(hovered[2])
-            else:
-                if node.type == utils.CELL_EMPTY:
-                    self.add_node(hovered[2], self.selector)
-                    self.just_altered = hovered
+        if len(self.clipboard[4]) == 0:
+            self.clipboard = None
+            return False
+        return True
+
+    def cut_selection(self,):
+        if self.selection_rect != None:
+            x0, y0 = self.selection_rect[0], self.selection_rect[1]
+        elif self.selected_object_id != None:
+            x0, y0 = self.get_object_rect(self.selected_object_id)[:2]
+        if not self.copy_selection():
+            return False
+
+        for i, j in zip(*np.nonzero(self.clipboard[0])):
+            self.remove_node((y0+i)*self.grid_width + (x0+j))
+        self.update_objects()
+        self.history.commit()
+        self.selection_rect = None
+        return True
+
+    def arm_paste(self,):
+        self.paste_armed = self.clipboard != None
+        return self.paste_armed
+
+    def paste(self, index):
+        types, conn_h, conn_v, labels, names = self.clipboard
+
+        # pasted objects keep their names unless the name is already in use
+        taken = {}
+        for object_id, obj in self.objects.items():
+            taken[obj.name] = True
+        new_names = []
+        for name in names:
+            new_name, suffix = name, 2
+            while new_name in taken:
+                new_name = f'{name}_{suffix}'
+                suffix += 1
+            taken[new_name] = True
+            new_names.append(new_name)
+
+        placed = self.blit(index%self.grid_width, index//self.grid_width, types, conn_h, conn_v, connect_outside=False)
+        for (i, j), cell in placed.items():
+            self.pending_names[cell] = new_names[labels[i][j]]
+
+    def move_object(self, object_id, dx, dy):
+        x0, y0, x1, y1 = self.get_object_rect(object_id)
+
+        # the object stops at the grid border instead of losing the voxels that would fall off
+        dx = max(-x0, min(dx, self.grid_width-1 - x1))
+        dy = max(-y0, min(dy, self.grid_height-1 - y1))
+        if dx == 0 and dy == 0:
+            return False
+
+        # moving onto another object would overwrite it
+        for index in self.objects[object_id].nodes:
+            target = index + dy*self.grid_width + dx
+            if self.get_node_by_index(target).type != utils.CELL_EMPTY and self.node_to_object.get(target) != object_id:
+                return False
+
+        types, conn_h, conn_v, labels, names = self.extract_region(x0, y0, x1, y1, {object_id: True})
+
+        # the cells left behind are emptied in the same write that fills the new ones
+        vacated = {index: utils.CELL_EMPTY for index in self.objects[object_id].nodes}
+        placed = self.blit(x0+dx, y0+dy, types, conn_h, conn_v, connect_outside=False, cells=vacated)
+        for (i, j), cell in placed.items():
+            self.pending_names[cell] = names[labels[i][j]]
+        return True
+
+    def mirror_clipboard(self,):
+        if self.clipboard == None:
+            return
+        types, conn_h, conn_v, labels, names = self.clipboard
+        self.clipboard = (np.fliplr(types), np.fliplr(conn_h), np.fliplr(conn_v), np.fliplr(labels), names)
+
+    def rotate_clipboard(self,):
+        if self.clipboard == None:
+            return
+        types, conn_h, conn_v, labels, names = self.clipboard
+
+        # a quarter turn swaps the link directions and the actuator axes
+        types = np.rot90(types).copy()
+        act_h, act_v = types == utils.CELL_ACT_H, types == utils.CELL_ACT_V
+        types[act_h] = utils.CELL_ACT_V
+        types[act_v] = utils.CELL_ACT_H
+        self.clipboard = (types, np.rot90(conn_v), np.rot90(conn_h), np.rot90(labels), names)
+
+    def fill_rect(self, start, end, value):
+        x0, y0 = start%self.grid_width, start//self.grid_width
+        x1, y1 = end%self.grid_width, end//self.grid_width
+        lx, ly, hx, hy = min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+        # mirrors of a rectangle are rectangles, so each cell is painted once however the copies overlap
+        rects = [(lx, ly, hx, hy)]
+        axis_x, axis_y = self.get_symmetry_axes()
+        if axis_x != None:
+            rects.append((int(2*axis_x) - hx, ly, int(2*axis_x) - lx, hy))
+        if axis_y != None:
+            rects.append((lx, int(2*axis_y) - hy, hx, int(2*axis_y) - ly))
+        if axis_x != None and axis_y != None:
+            rects.append((int(2*axis_x) - hx, int(2*axis_y) - hy, int(2*axis_x) - lx, int(2*axis_y) - ly))
+
+        # only cells that change are written, the types of the rectangle are compared as one array
+        cells = {}
+        for rx0, ry0, rx1, ry1 in rects:
+            rx0, ry0 = max(0, rx0), max(0, ry0)
+            rx1, ry1 = min(self.grid_width-1, rx1), min(self.grid_height-1, ry1)
+            if rx0 > rx1 or ry0 > ry1:
+                continue
+            types = np.zeros((ry1-ry0+1, rx1-rx0+1), dtype=np.uint8)
+            for x, y, node in self.grid.items_in(rx0, rx1+1, ry0, ry1+1):
+                types[y-ry0, x-rx0] = node.type
+            ys, xs = np.nonzero(types != value)
+            for index in ((ys + ry0)*self.grid_width + xs + rx0).tolist():
+                cells[index] = value
+
+        self.write_cells(cells)
+
+    def flood_paint(self, index, value):
+        target = self.get_node_by_index(index).type
+        if target == value:
+            return
+
+        # collect the whole same-type region and its mirrors first, then write it as one batch
+        region = {index: True}
+        frontier = [index]
+        while len(frontier) > 0:
+            curr = frontier.pop()
+            for node in [self.get_left(curr), self.get_right(curr), self.get_up(curr), self.get_down(curr)]:
+                if node == None or node.type != target or node.id in region:
+                    continue
+                region[node.id] = True
+                frontier.append(node.id)
+
+        cells = {}
+        for node_id in region:
+            cells[node_id] = value
+            for mirror in self.get_mirrors(node_id):
+                cells[mirror] = value
+        self.write_cells(cells)
+
+    def load_pattern(self, file_name):
+        loaded_arrays = self.dm.load_arrays(file_name)
+        if loaded_arrays == None:
+            return False
+
+        types, conn_h, conn_v, labels, names = loaded_arrays
+        ys, xs = np.nonzero(types)
+        if len(ys) == 0:
+            return False
+
+        # crop to the bounding box of the filled cells
+        ly, hy, lx, hx = ys.min(), ys.max()+1, xs.min(), xs.max()+1
+        self.pattern = (types[ly:hy, lx:hx], conn_h[ly:hy, lx:hx-1], conn_v[ly:hy-1, lx:hx])
+        return True
+
+    def stamp_pattern(self, index):
+        if self.pattern == None:
+            return
+        x0, y0 = index%self.grid_width, index//self.grid_width
+        self.blit(x0, y0, *self.pattern)
+
+        # mirrored copies of the pattern, flipped the same way as the cells
+        axis_x, axis_y = self.get_symmetry_axes()
+        types, conn_h, conn_v = self.pattern
+        height, width = types.shape
+        copies = []
+        if axis_x != None:
+            copies.append((int(2*axis_x) - (x0+width-1), y0, np.fliplr(types), np.fliplr(conn_h), np.fliplr(conn_v)))
+        if axis_y != None:
+            copies.append((x0, int(2*axis_y) - (y0+height-1), np.flipud(types), np.flipud(conn_h), np.flipud(conn_v)))
+        if axis_x != None and axis_y != None:
+            copies.append((int(2*axis_x) - (x0+width-1), int(2*axis_y) - (y0+height-1), types[::-1, ::-1], conn_h[::-1, ::-1], conn_v[::-1, ::-1]))
+        for copy in copies:
+            if copy[:2] != (x0, y0) or not np.array_equal(copy[2], types):
+                self.blit(*copy)
+
+    def blit(self, x0, y0, types, conn_h, conn_v, connect_outside=True, cells=None):
+        height, width = types.shape
+
+        # empty pattern cells leave the grid untouched, the rest is clipped to the grid
+        ys, xs = np.nonzero(types != utils.CELL_EMPTY)
+        inside = (xs + x0 >= 0) & (xs + x0 < self.grid_width) & (ys + y0 >= 0) & (ys + y0 < self.grid_height)
+        ys, xs = ys[inside], xs[inside]
+        indices = (ys + y0)*self.grid_width + xs + x0
+
+        placed = {}
+        if cells == None:
+            cells = {}
+        for i, j, cell, value in zip(ys.tolist(), xs.tolist(), indices.tolist(), types[ys, xs].tolist()):
+            cells[cell] = value
+            placed[(i, j)] = cell
+
+        # links inside come from the pattern, links to the surroundings follow connect_outside
+        links = {}
+        for (i, j), cell in placed.items():
+            if (i, j+1) in placed:
+                links[(cell, cell+1)] = bool(conn_h[i][j])
+            if (i+1, j) in placed:
+                links[(cell, cell+self.grid_width)] = bool(conn_v[i][j])
+        self.write_cells(cells, links, connect_outside)
+        return placed
+
+    def write_cells(self, cells, links=None, connect_outside=True):
+        """
+        Gives every cell of a batch its final type and links in one pass, so no link is made and then undone again.
+        Like painting voxel by voxel, retyped voxels keep their links and new voxels link to every neighbor.
+
+        Args:
+            cells (dict): cell index to its new type.
+            links (dict): (lower index, higher index) of neighboring cells to whether they are linked, overriding
+                the rules above. (default = None)
+            connect_outside (bool): whether new voxels link to voxels outside the batch, like a brush stroke.
+                When False, the batch is cut loose from its surroundings. (default = True)
+        """
+        if links == None:
+            links = {}
+        sides = [(-1, 0, history.LINK_LEFT), (1, 0, history.LINK_RIGHT), (0, -1, history.LINK_UP), (0, 1, history.LINK_DOWN)]
+
+        states = {}
+        for index, value in cells.items():
+            x, y = index%self.grid_width, index//self.grid_width
+            node = self.grid.node_at(x, y)
+
+            # neighbors by index, empty ones have no node but may be filled by the same batch
+            neighbors = []
+            for dx, dy, bit in sides:
+                if self.is_valid(x+dx, y+dy):
+                    neighbors.append((index + dy*self.grid_width + dx, self.grid.get(x+dx, y+dy), bit))
+
+            mask, old_mask = 0, 0
+            for other_id, other, bit in neighbors:
+                other_type = other.type if other != None else utils.CELL_EMPTY
+                if other_id in node.neighbors:
+                    old_mask |= bit
+                if value == utils.CELL_EMPTY or cells.get(other_id, other_type) == utils.CELL_EMPTY:
+                    continue
+                pair = (min(index, other_id), max(index, other_id))
+                if pair in links:
+                    linked = links[pair]
+                elif not other_id in cells and not connect_outside:
+                    linked = False
+                elif node.type != utils.CELL_EMPTY and other_type != utils.CELL_EMPTY:
+                    # retyped voxels keep their links, new ones link to every neighbor like add_node
+                    linked = other_id in node.neighbors
                 else:
-                    if node.type != self.selector:
-                        self.edit_node(hovered[2], self.selector)
-                        self.just_altered = hovered
+                    linked = True
+                if linked:
+                    mask |= bit
+            if value != node.type or mask != old_mask:
+                states[index] = (value, mask, node.type != utils.CELL_EMPTY and mask == old_mask, neighbors)
+
+        # neighbors outside the batch may lose or gain a link, so they are recorded for undo too
+        for index, (value, mask, retype, neighbors) in states.items():
+            self.history.touch(index)
+            if retype:
+                continue
+            for other_id, other, bit in neighbors:
+                if other != None and other.type != utils.CELL_EMPTY:
+                    self.history.touch(other_id)
+                    self.dirty_nodes[other_id] = True
+
+        for index, (value, mask, retype, neighbors) in states.items():
+            # a voxel that only changes type stays in its object, which spares the batch a relabel
+            if retype and value != utils.CELL_EMPTY:
+                self.edit_node(index, value)
+            else:
+                self.set_cell_state(index, value, mask)
+
+    def paint_node(self, index, value):
+        node = self.get_node_by_index(index)
+
+        if value == utils.CELL_EMPTY:
+            if node.type != utils.CELL_EMPTY:
+                self.remove_node(index)
+        else:
+            if node.type == utils.CELL_EMPTY:
+                self.add_node(index, value)
+            else:
+                if node.type != value:
+                    self.edit_node(index, value)
 
     def toggle_connection(self, a_id, b_id):
         a_node = self.get_node_by_index(a_id)
         b_node = self.get_node_by_index(b_id)
+        self.history.touch(a_id)
+        self.history.touch(b_id)
 
         if a_id in b_node.neighbors:
             del b_node.neighbors[a_id]
@@ -280,40 +924,179 @@ class Env:
             b_node.neighbors[a_id] = True
             a_node.neighbors[b_id] = True
 
+        self.dirty_nodes[a_id] = True
+        self.dirty_nodes[b_id] = True
+        self.grid_changed = True
         self.need_to_update_objects = True
 
+    def set_connection(self, a_id, b_id, connected):
+        if (a_id in self.get_node_by_index(b_id).neighbors) != bool(connected):
+            self.toggle_connection(a_id, b_id)
+
+    def uncount_node(self, index):
+        # takes a voxel out of its object's stats before it changes, it is counted again at the next relabel
+        if index in self.stats_pending:
+            return
+        self.stats_pending[index] = True
+        stats = self.object_stats.get(self.node_to_object.get(index))
+        if stats != None:
+            stats.remove(index%self.grid_width, index//self.grid_width, self.get_node_by_index(index).type)
+
     def remove_node(self, index):
+        self.history.touch(index)
+        self.uncount_node(index)
+        x, y = index%self.grid_width, index//self.grid_width
         self.get_node_by_index(index).type = utils.CELL_EMPTY
+        self.altered_nodes[index] = True
+        self.grid_changed = True
         neighbors = [self.get_left(index), self.get_right(index), self.get_up(index), self.get_down(index)]
 
         for node in neighbors:
             if node == None or node.type == utils.CELL_EMPTY:
                 continue
+            self.history.touch(node.id)
             if index in node.neighbors:
                 del node.neighbors[index]
             if node.id in self.get_node_by_index(index).neighbors:
                 del self.get_node_by_index(index).neighbors[node.id]            
+            self.dirty_nodes[node.id] = True
 
+        self.grid.release(x, y)
+        self.dirty_nodes[index] = True
         self.need_to_update_objects = True
 
     def add_node(self, index, value):
-        self.get_node_by_index(index).type = value
+        self.history.touch(index)
+        self.uncount_node(index)
+        self.grid.create(index%self.grid_width, index//self.grid_width).type = value
+        self.altered_nodes[index] = True
+        self.grid_changed = True
         neighbors = [self.get_left(index), self.get_right(index), self.get_up(index), self.get_down(index)]
 
         for node in neighbors:
             if node == None or node.type == utils.CELL_EMPTY:
                 continue
+            self.history.touch(node.id)
             node.neighbors[index] = True
             self.get_node_by_index(index).neighbors[node.id] = True
+            self.dirty_nodes[node.id] = True
 
+        self.dirty_nodes[index] = True
         self.need_to_update_objects = True
 
     def edit_node(self, index, value):
-        self.get_node_by_index(index).type = value
+        self.history.touch(index)
+        node = self.get_node_by_index(index)
+
+        # retyping doesn't change which object the voxel belongs to, so its stats can be patched in place
+        if not index in self.stats_pending:
+            stats = self.object_stats.get(self.node_to_object.get(index))
+            if stats != None:
+                stats.set_type(node.type, value)
+        node.type = value
+        self.altered_nodes[index] = True
+        self.grid_changed = True
+
+    def get_cell_state(self, index):
+        node = self.get_node_by_index(index)
+        neighbors = [self.get_left(index), self.get_right(index), self.get_up(index), self.get_down(index)]
+        bits = [history.LINK_LEFT, history.LINK_RIGHT, history.LINK_UP, history.LINK_DOWN]
+
+        mask = 0
+        for other, bit in zip(neighbors, bits):
+            if other != None and other.id in node.neighbors:
+                mask |= bit
+        return node.type, mask
+
+    def get_cell_name(self, index):
+        object_id = self.node_to_object.get(index)
+        if object_id == None or not object_id in self.objects:
+            return None
+        return self.objects[object_id].name
+
+    def set_cell_state(self, index, value, mask):
+        self.uncount_node(index)
+        x, y = index%self.grid_width, index//self.grid_width
+        node = self.grid.create(x, y)
+        neighbors = [self.get_left(index), self.get_right(index), self.get_up(index), self.get_down(index)]
+        bits = [history.LINK_LEFT, history.LINK_RIGHT, history.LINK_UP, history.LINK_DOWN]
+
+        node.type = value
+        for other, bit in zip(neighbors, bits):
+            if other == None:
+                continue
+            if mask & bit:
+                node.neighbors[other.id] = True
+                other.neighbors[index] = True
+            else:
+                node.neighbors.pop(other.id, None)
+                other.neighbors.pop(index, None)
+        self.grid.release(x, y)
+
+        self.altered_nodes[index] = True
+        self.grid_changed = True
+        self.dirty_nodes[index] = True
+        self.need_to_update_objects = True
+
+    def undo(self,):
+        entry = self.history.pop_undo()
+        if entry == None:
+            return None
+        self.apply_history_entry(entry, backwards=True)
+        return self.grid_width, self.grid_height
+
+    def redo(self,):
+        entry = self.history.pop_redo()
+        if entry == None:
+            return None
+        self.apply_history_entry(entry, backwards=False)
+        return self.grid_width, self.grid_height
+
+    def apply_history_entry(self, entry, backwards):
+        entry, names = entry
+
+        # replay the records in reverse to undo, in order to redo
+        starts = range(0, len(entry), history.RECORD_SIZE)
+        if backwards:
+            starts = reversed(starts)
+
+        self.history.paused = True
+        for start in starts:
+            op, index, old_type, new_type, old_mask, new_mask = entry[start:start+history.RECORD_SIZE]
+            if op == history.CELL:
+                if backwards:
+                    self.set_cell_state(index, old_type, old_mask)
+                else:
+                    self.set_cell_state(index, new_type, new_mask)
+                # cells get back the name of their object, e.g. an erased object keeps its name when undone
+                if start in names:
+                    name = names[start][0] if backwards else names[start][1]
+                    if name != None:
+                        self.pending_names[index] = name
+                continue
+
+            # objects must match the grid before indices are remapped
+            self.update_objects()
+            if op == history.ADD_COL or op == history.REMOVE_COL:
+                if (op == history.ADD_COL) != backwards:
+                    self.add_col(index)
+                else:
+                    self.remove_col(index)
+            if op == history.ADD_ROW or op == history.REMOVE_ROW:
+                if (op == history.ADD_ROW) != backwards:
+                    self.add_row(index)
+                else:
+                    self.remove_row(index)
+        self.history.paused = False
+
+        self.update_objects()
+        self.hovered_object_id = None
+        self.selected_object_id = None
+        self.selection_rect = None
 
     def get_node_by_index(self, index):
         x, y = index%self.grid_width, index//self.grid_width
-        node = self.grid[y][x]
+        node = self.grid.node_at(x, y)
         assert node.id == index, 'Index mismatch, something has gone terribly wrong.'
         return node
 
@@ -321,28 +1104,28 @@ class Env:
         x, y = index%self.grid_width, index//self.grid_width
         x -= 1
         if self.is_valid(x, y):
-            return self.grid[y][x]
+            return self.grid.node_at(x, y)
         return None
 
     def get_right(self, index):
         x, y = index%self.grid_width, index//self.grid_width
         x += 1
         if self.is_valid(x, y):
-            return self.grid[y][x]
+            return self.grid.node_at(x, y)
         return None    
 
     def get_up(self, index):
         x, y = index%self.grid_width, index//self.grid_width
         y -= 1
         if self.is_valid(x, y):
-            return self.grid[y][x]
+            return self.grid.node_at(x, y)
         return None    
 
     def get_down(self, index):
         x, y = index%self.grid_width, index//self.grid_width
         y += 1
         if self.is_valid(x, y):
-            return self.grid[y][x]
+            return self.grid.node_at(x, y)
         return None
 
     def is_valid(self, x, y):
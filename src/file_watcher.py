@@ -0,0 +1,100 @@
+import os
+import queue
+import threading
+
+FILE_CHANGED = 0
+DIRECTORY_CHANGED = 1
+
+class FileWatcher:
+    """
+    Polls the modification times of one file and the listing of one directory on a background thread. A change is
+    only reported once the file has stopped changing for a poll, so files still being written by another program are
+    not picked up halfway. Events are collected with poll from the thread that owns the editor state.
+
+    Args:
+        directory (str): directory to watch for added, removed or modified designs.
+        interval (float): seconds between polls. (default = 1.0)
+    """
+    def __init__(self, directory, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+
+        self.lock = threading.Lock()
+        self.file_path = None
+        self.file_stamp = None
+        self.events = queue.Queue()
+
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def get_stamp(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get_listing(self,):
+        listing = {}
+        if not os.path.isdir(self.directory):
+            return listing
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.json'):
+                stat = entry.stat()
+                listing[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return listing
+
+    def watch_file(self, path):
+        """
+        Start watching a file, e.g. after loading or saving it. Its current state is taken as already seen.
+        """
+        with self.lock:
+            self.file_path = path
+            self.file_stamp = self.get_stamp(path)
+
+    def run(self,):
+        listing = self.get_listing()
+        changed_stamp = None
+        changed_listing = None
+
+        while not self.stop_event.wait(self.interval):
+            with self.lock:
+                path, seen_stamp = self.file_path, self.file_stamp
+            if path != None:
+                stamp = self.get_stamp(path)
+                if stamp != None and stamp != seen_stamp:
+                    # wait for one quiet poll before reporting
+                    if stamp == changed_stamp:
+                        with self.lock:
+                            if self.file_path == path and self.file_stamp == seen_stamp:
+                                self.file_stamp = stamp
+                                self.events.put((FILE_CHANGED, path))
+                        changed_stamp = None
+                    else:
+                        changed_stamp = stamp
+
+            new_listing = self.get_listing()
+            if new_listing != listing:
+                if new_listing == changed_listing:
+                    listing = new_listing
+                    self.events.put((DIRECTORY_CHANGED, self.directory))
+                    changed_listing = None
+                else:
+                    changed_listing = new_listing
+
+    def poll(self,):
+        """
+        Returns:
+            list: (FILE_CHANGED or DIRECTORY_CHANGED, path) events since the last poll.
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def stop(self,):
+        self.stop_event.set()
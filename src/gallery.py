@@ -0,0 +1,132 @@
+from tkinter import *
+from tkinter.ttk import *
+
+import os
+
+class Gallery:
+    """
+    Window showing a thumbnail for every design in a directory. Only the rows in view are drawn and only their
+    thumbnails are requested, so directories with thousands of designs scroll as fast as a short one.
+
+    Args:
+        master: Tk root.
+        directory (str): directory of design files.
+        thumbnails (ThumbnailCache): cache producing the images.
+        pick_func (callable): called with the file name of a clicked design.
+    """
+    def __init__(self, master, directory, thumbnails, pick_func):
+        self.master = master
+        self.directory = directory
+        self.thumbnails = thumbnails
+        self.pick_func = pick_func
+
+        self.cell_width = thumbnails.size + 24
+        self.cell_height = thumbnails.size + 40
+
+        self.window = Toplevel(master)
+        self.window.title(f'Load Design - {directory}')
+        self.window.geometry(f'{self.cell_width*5 + 40}x{self.cell_height*4}')
+        self.window.protocol('WM_DELETE_WINDOW', self.close)
+
+        self.canvas = Canvas(self.window, background='white', highlightthickness=0, yscrollincrement=self.cell_height//4)
+        self.scroll = Scrollbar(self.window, orient='vertical', command=self.yview)
+        self.canvas.configure(yscrollcommand=self.scroll.set)
+        self.scroll.pack(side='right', fill='y')
+        self.canvas.pack(side='left', fill='both', expand='yes')
+
+        self.canvas.bind('<Configure>', lambda event: self.layout())
+        self.canvas.bind('<Button-1>', self.click)
+        self.canvas.bind('<MouseWheel>', self.wheel)
+        self.canvas.bind('<Button-4>', self.wheel)
+        self.canvas.bind('<Button-5>', self.wheel)
+
+        self.files = []
+        self.list_files()
+
+        self.columns = 1
+        self.visible = {}
+        self.is_open = True
+        self.poll()
+
+    def list_files(self,):
+        # listing only stats the files, they are read and parsed by the thumbnail workers
+        self.files = []
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith('.json'):
+                    self.files.append((entry.name, entry.path, entry.stat().st_mtime))
+        self.files.sort()
+
+    def refresh(self,):
+        self.list_files()
+        self.layout()
+
+    def layout(self,):
+        self.columns = max(1, self.canvas.winfo_width()//self.cell_width)
+        rows = (len(self.files) + self.columns - 1)//self.columns
+        self.canvas.configure(scrollregion=(0, 0, self.columns*self.cell_width, max(1, rows*self.cell_height)))
+        self.redraw()
+
+    def get_visible_range(self,):
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first_row = max(0, int(top//self.cell_height))
+        last_row = int(bottom//self.cell_height) + 1
+        return first_row*self.columns, min(len(self.files), last_row*self.columns)
+
+    def redraw(self,):
+        self.canvas.delete('all')
+        first, last = self.get_visible_range()
+
+        self.visible = {}
+        for index in range(first, last):
+            name, path, mtime = self.files[index]
+            self.visible[(path, mtime)] = True
+
+            x = (index%self.columns)*self.cell_width + self.cell_width//2
+            y = (index//self.columns)*self.cell_height
+            image = self.thumbnails.get(path, mtime)
+            if image == None:
+                self.canvas.create_text(x, y + 12 + self.thumbnails.size//2, text='...', fill='gray')
+            elif image == False:
+                self.canvas.create_text(x, y + 12 + self.thumbnails.size//2, text='invalid', fill='gray')
+            else:
+                self.canvas.create_image(x, y + 12 + self.thumbnails.size//2, image=image)
+            self.canvas.create_text(x, y + self.thumbnails.size + 26, text=os.path.splitext(name)[0], width=self.cell_width-8)
+
+        self.thumbnails.cancel_except(self.visible)
+
+    def poll(self,):
+        if not self.is_open:
+            return
+        done = self.thumbnails.poll()
+        for path in done:
+            if any(key[0] == path for key in self.visible):
+                self.redraw()
+                break
+        self.window.after(50, self.poll)
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.redraw()
+
+    def wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.yview('scroll', -1, 'units')
+        else:
+            self.yview('scroll', 1, 'units')
+
+    def click(self, event):
+        column = int(self.canvas.canvasx(event.x)//self.cell_width)
+        row = int(self.canvas.canvasy(event.y)//self.cell_height)
+        index = row*self.columns + column
+        if column >= self.columns or index >= len(self.files):
+            return
+        name = self.files[index][0]
+        self.close()
+        self.pick_func(name)
+
+    def close(self,):
+        self.is_open = False
+        self.thumbnails.cancel_except({})
+        self.window.destroy()
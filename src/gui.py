@@ -4,8 +4,17 @@ from ttkbootstrap import Style
 import tkinter.messagebox as mb
 
 import os
+import base64
+
+from concurrent.futures import ThreadPoolExecutor
 
 import utils
+import gallery
+import thumbnail_cache
+import file_watcher
+import data_manager
+import similarity_index
+import design_diff
 
 #https://github.com/israel-dryer/ttkbootstrap
 #https://github.com/israel-dryer/ttkbootstrap/blob/master/src/ttkcreator/__init__.py
@@ -32,6 +41,7 @@ class GUI:
         style = Style(theme='cosmo')
         #style.configure("BW.TLabel", foreground="black", background="white")
         style.configure("debug.TFrame", background="white", padding=60)
+        style.configure("selected.TLabel", background="#2780e3", foreground="white")
         
         self.vpad = 10
         self.hpad = 15
@@ -49,8 +59,32 @@ class GUI:
         self.pi_load = Button(self.pi_frame, text="Load", command=self.load_click)
         self.pi_load.pack(side='left', fill='x', expand='yes', padx=2)
 
+        self.pi_browse = Button(self.pi_frame, text="Browse", command=self.browse_click)
+        self.pi_browse.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.pi_similar = Button(self.pi_frame, text="Similar", command=self.similar_click)
+        self.pi_similar.pack(side='left', fill='x', expand='yes', padx=2)
+
         self.pi_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad)
 
+        ### EvoGym Export ###
+        self.eg_frame = Labelframe(self.master, text='EvoGym Export', padding=15)
+
+        self.eg_name = Entry(self.eg_frame)
+        self.eg_name.insert('end', 'my_robot')
+        self.eg_name.pack(side='left', fill='x', expand='yes')
+
+        self.eg_object = Button(self.eg_frame, text="Object", command=self.export_object_click)
+        self.eg_object.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.eg_robot = Button(self.eg_frame, text="Robot", command=self.export_robot_click)
+        self.eg_robot.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.eg_import = Button(self.eg_frame, text="Import Robot", command=self.import_robot_click)
+        self.eg_import.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.eg_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad)
+
         ### Grid Size
         self.gs_frame = Labelframe(self.master, text='Grid Size', padding=15)
 
@@ -104,18 +138,147 @@ class GUI:
 
         self.vs_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad)
 
+        ### Voxel Tool ###
+        self.tool_frame = Labelframe(self.master, text='Voxel Tool', padding=15)
+
+        self.tool_options = ['Brush', 'Rectangle Fill', 'Flood Fill', 'Stamp Pattern']
+        self.tool_text = StringVar()
+        self.tool_menu = OptionMenu(self.tool_frame, self.tool_text, self.tool_options[0], *tuple(self.tool_options))
+        self.tool_menu.pack(side='left', fill='x', padx=(5, 0), pady=5)
+
+        self.tool_pattern = Entry(self.tool_frame)
+        self.tool_pattern.insert('end', 'my_pattern.json')
+        self.tool_pattern.pack(side='left', fill='x', expand='yes', padx=(10, 0))
+
+        self.tool_load = Button(self.tool_frame, text="Load Pattern", command=self.load_pattern_click)
+        self.tool_load.pack(side='left', fill='x', padx=2)
+
+        self.tool_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad)
+
+        ### Symmetry ###
+        self.sym_frame = Labelframe(self.master, text='Symmetry', padding=15)
+
+        self.sym_options = ['None', 'Left-Right', 'Top-Bottom', 'Both']
+        self.sym_text = StringVar()
+        self.sym_menu = OptionMenu(self.sym_frame, self.sym_text, self.sym_options[0], *tuple(self.sym_options))
+        self.sym_menu.pack(side='left', fill='x', padx=(5, 0), pady=5)
+
+        self.sym_x_label = Label(self.sym_frame, text="X Axis")
+        self.sym_x_label.pack(side='left', padx=(10, 5))
+
+        self.sym_x_entry = Entry(self.sym_frame, width=6)
+        self.sym_x_entry.pack(side='left', fill='x', expand='yes')
+
+        self.sym_y_label = Label(self.sym_frame, text="Y Axis")
+        self.sym_y_label.pack(side='left', padx=(10, 5))
+
+        self.sym_y_entry = Entry(self.sym_frame, width=6)
+        self.sym_y_entry.pack(side='left', fill='x', expand='yes')
+
+        self.sym_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad)
+
+        ### Clipboard ###
+        self.cb_frame = Labelframe(self.master, text='Clipboard', padding=15)
+
+        self.cb_copy = Button(self.cb_frame, text="Copy", command=self.copy_click)
+        self.cb_copy.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.cb_cut = Button(self.cb_frame, text="Cut", command=self.cut_click)
+        self.cb_cut.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.cb_paste = Button(self.cb_frame, text="Paste", command=self.paste_click)
+        self.cb_paste.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.cb_mirror = Button(self.cb_frame, text="Mirror", command=self.mirror_click)
+        self.cb_mirror.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.cb_rotate = Button(self.cb_frame, text="Rotate", command=self.rotate_click)
+        self.cb_rotate.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.cb_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad)
+
+        ### History ###
+        self.h_frame = Labelframe(self.master, text='History', padding=15)
+
+        self.h_undo = Button(self.h_frame, text="Undo", command=self.undo_click)
+        self.h_undo.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.h_redo = Button(self.h_frame, text="Redo", command=self.redo_click)
+        self.h_redo.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.h_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad)
+
+        ### Compare ###
+        self.df_frame = Labelframe(self.master, text='Compare With', padding=15)
+
+        self.df_name = Entry(self.df_frame)
+        self.df_name.pack(side='left', fill='x', expand='yes')
+
+        self.df_compare = Button(self.df_frame, text="Compare", command=self.compare_click)
+        self.df_compare.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.df_clear = Button(self.df_frame, text="Clear", command=self.clear_compare_click)
+        self.df_clear.pack(side='left', fill='x', expand='yes', padx=2)
+
+        self.df_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad)
+
+        self.master.bind('<Control-z>', self.undo_click)
+        self.master.bind('<Control-y>', self.redo_click)
+
+        ### Objects ###
+        # only ol_row_count labels exist, scrolling changes which objects they show
+        self.ol_frame = Labelframe(self.master, text='Objects', padding=15)
+        self.ol_row_count = 8
+
+        self.ol_filter_text = StringVar()
+        self.ol_filter = Entry(self.ol_frame, textvariable=self.ol_filter_text)
+        self.ol_filter.pack(side='top', fill='x', expand='yes')
+        self.ol_filter_text.trace_add('write', self.filter_objects)
+
+        self.ol_list_frame = Frame(self.ol_frame)
+        self.ol_rows = []
+        for i in range(self.ol_row_count):
+            row = Label(self.ol_list_frame, text='', anchor='w', padding=(5, 1))
+            row.grid(row=i, column=0, sticky='ew')
+            row.bind('<Button-1>', lambda event, slot=i: self.object_row_click(slot))
+            row.bind('<MouseWheel>', self.object_list_wheel)
+            row.bind('<Button-4>', self.object_list_wheel)
+            row.bind('<Button-5>', self.object_list_wheel)
+            self.ol_rows.append(row)
+        self.ol_scroll = Scrollbar(self.ol_list_frame, orient='vertical', command=self.object_list_yview)
+        self.ol_scroll.grid(row=0, column=1, rowspan=self.ol_row_count, sticky='ns')
+        self.ol_list_frame.columnconfigure(0, weight=1)
+        self.ol_list_frame.pack(side='top', fill='x', expand='yes', pady=5)
+
+        self.ol_rename = Entry(self.ol_frame)
+        self.ol_rename.pack(side='left', fill='x', expand='yes')
+
+        self.ol_rename_button = Button(self.ol_frame, text="Rename", command=self.rename_click)
+        self.ol_rename_button.pack(side='left', fill='x', padx=2)
+
+        self.ol_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad)
+
         ### Object Name ###
         self.o_frame = Labelframe(self.master, text='Object Name', padding=15)
 
         self.o_name = Entry(self.o_frame)
         self.o_name.insert('end', 'object_name')
-        self.o_name.pack(side='left', fill='x', expand='yes')
+        self.o_name.pack(side='top', fill='x', expand='yes')
+
+        self.o_stats = Label(self.o_frame, text='', justify='left')
+        self.o_stats.pack(side='top', fill='x', pady=(10, 0))
 
         self.o_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad)
 
         ### Variables ###
         self.last_object_viewed = None
-        self.mode_data = {'mode': utils.VOXELS, 'selector': utils.CELL_SOFT}
+        self.last_stats_viewed = None
+        self.ol_ids = []
+        self.ol_first = 0
+        self.ol_slots = [None]*self.ol_row_count
+        self.ol_selected = None
+        self.ol_dirty = False
+        self.mode_data = {'mode': utils.VOXELS, 'selector': utils.CELL_SOFT, 'tool': utils.BRUSH, 'symmetry': utils.SYMMETRY_NONE, 'symmetry_axis': (None, None)}
         self.old_mode = utils.VOXELS
         self.objects = {}
         self.old_gs_width = None
@@ -123,12 +286,52 @@ class GUI:
 
         self.save_path = 'exported'
         self.default_type = '.json'
+        self.thumbnails = None
+        self.gallery = None
+
+        # reparse the loaded file in the background when another program rewrites it
+        self.watcher = file_watcher.FileWatcher(self.save_path)
+        self.reload_pool = ThreadPoolExecutor(max_workers=1)
+        self.reload_job = None
+        self.reload_asking = False
+        self.swap_env_func = None
+
+        # the index is only touched by its own pool thread, which brings it up to date before every query, so a
+        # long update never holds up a reload
+        self.similar_pool = ThreadPoolExecutor(max_workers=1)
+        self.similarity = None
+        self.similar_job = None
+
+        # the overlay is recomputed against the compared file whenever the editor contents change, on its own
+        # thread from a snapshot of the editor, with at most one diff in flight
+        self.compare_pool = ThreadPoolExecutor(max_workers=1)
+        self.compare_job = None
+        self.compare_arrays = None
+        self.compare_dirty = False
+        self.compare_size = None
 
         self.save_env_func = None
         self.load_env_func = None
         self.load_viewer_func = None
         self.gs_env_func = None
         self.gs_viewer_func = None
+        self.pattern_env_func = None
+        self.copy_env_func = None
+        self.cut_env_func = None
+        self.paste_env_func = None
+        self.mirror_env_func = None
+        self.rotate_env_func = None
+        self.undo_env_func = None
+        self.redo_env_func = None
+        self.stats_env_func = None
+        self.rename_env_func = None
+        self.select_viewer_func = None
+        self.features_env_func = None
+        self.arrays_env_func = None
+        self.export_object_env_func = None
+        self.export_robot_env_func = None
+        self.import_robot_env_func = None
+        self.diff_viewer_func = None
 
         # self.pi_frame2 = Labelframe(self.master, text='Project Information', padding=15)
         # #self.pi_frame.pack(fill=X, anchor='n', expand=True)
@@ -153,12 +356,56 @@ class GUI:
         # test_button1 = Button(self.gs_frame, text="Red")
         # test_button1.pack()
 
-    def set_funcs(self, save_env_func, load_env_func, load_viewer_func, gs_env_func, gs_viewer_func):
+    def set_funcs(self, save_env_func, load_env_func, load_viewer_func, gs_env_func, gs_viewer_func, pattern_env_func):
         self.save_env_func = save_env_func
         self.load_env_func = load_env_func
         self.load_viewer_func = load_viewer_func
         self.gs_env_func = gs_env_func
         self.gs_viewer_func = gs_viewer_func
+        self.pattern_env_func = pattern_env_func
+
+    def set_clipboard_funcs(self, copy_env_func, cut_env_func, paste_env_func, mirror_env_func, rotate_env_func):
+        self.copy_env_func = copy_env_func
+        self.cut_env_func = cut_env_func
+        self.paste_env_func = paste_env_func
+        self.mirror_env_func = mirror_env_func
+        self.rotate_env_func = rotate_env_func
+
+    def set_history_funcs(self, undo_env_func, redo_env_func):
+        self.undo_env_func = undo_env_func
+        self.redo_env_func = redo_env_func
+
+    def set_stats_func(self, stats_env_func):
+        self.stats_env_func = stats_env_func
+
+    def set_reload_func(self, swap_env_func):
+        self.swap_env_func = swap_env_func
+
+    def set_object_funcs(self, rename_env_func, select_viewer_func):
+        self.rename_env_func = rename_env_func
+        self.select_viewer_func = select_viewer_func
+
+    def set_similar_func(self, features_env_func):
+        self.features_env_func = features_env_func
+
+    def set_export_funcs(self, export_object_env_func, export_robot_env_func, import_robot_env_func):
+        self.export_object_env_func = export_object_env_func
+        self.export_robot_env_func = export_robot_env_func
+        self.import_robot_env_func = import_robot_env_func
+
+    def set_diff_funcs(self, arrays_env_func, diff_viewer_func):
+        self.arrays_env_func = arrays_env_func
+        self.diff_viewer_func = diff_viewer_func
+
+    def objects_changed(self, objects):
+        # the list is rebuilt on the next update, however many notifications arrive before it
+        self.objects = objects
+        self.ol_dirty = True
+        self.compare_dirty = True
+
+    def grid_changed(self, grid):
+        # commit listener, so retypes and connection edits refresh the overlay too
+        self.compare_dirty = True
 
     def update_object_info(self, objects, recently_updated_objects, hovered_object_id, selected_object_id):
 
@@ -178,11 +425,104 @@ class GUI:
             if recently_updated_objects:
                 self.o_name.delete(0, 'end')
                 self.o_name.insert('end', objects[curr_object_id].name)
-            else:
+            elif objects[curr_object_id].name != self.o_name.get():
                 objects[curr_object_id].name = self.o_name.get()
+                self.ol_dirty = True
+
+        if curr_object_id != None and self.stats_env_func != None:
+            self.update_object_stats(self.stats_env_func(curr_object_id))
 
         self.last_object_viewed = curr_object_id
 
+    def update_object_list(self, selected_object_id):
+        self.ol_selected = selected_object_id
+
+        if self.ol_dirty:
+            name_filter = self.ol_filter_text.get().lower()
+            self.ol_ids = [object_id for object_id, obj in self.objects.items() if name_filter in obj.name.lower()]
+            self.ol_ids.sort(key=lambda object_id: self.objects[object_id].name)
+            self.ol_dirty = False
+            self.set_object_list_first(self.ol_first)
+
+        # only labels whose text or highlight differ from what they show are reconfigured
+        for slot, row in enumerate(self.ol_rows):
+            index = self.ol_first + slot
+            state = ('', False)
+            if index < len(self.ol_ids):
+                object_id = self.ol_ids[index]
+                state = (self.objects[object_id].name, object_id == selected_object_id)
+            if state != self.ol_slots[slot]:
+                row.configure(text=state[0], style='selected.TLabel' if state[1] else 'TLabel')
+                self.ol_slots[slot] = state
+
+    def set_object_list_first(self, first):
+        self.ol_first = max(0, min(first, len(self.ol_ids) - self.ol_row_count))
+        if len(self.ol_ids) == 0:
+            self.ol_scroll.set(0, 1)
+        else:
+            self.ol_scroll.set(self.ol_first/len(self.ol_ids), min(1, (self.ol_first + self.ol_row_count)/len(self.ol_ids)))
+
+    def object_list_yview(self, *args):
+        if args[0] == 'moveto':
+            self.set_object_list_first(int(float(args[1])*len(self.ol_ids)))
+        elif args[0] == 'scroll':
+            step = self.ol_row_count if args[2] == 'pages' else 1
+            self.set_object_list_first(self.ol_first + int(args[1])*step)
+        self.update_object_list(self.ol_selected)
+
+    def object_list_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.object_list_yview('scroll', -1, 'units')
+        else:
+            self.object_list_yview('scroll', 1, 'units')
+
+    def filter_objects(self, *args):
+        self.ol_dirty = True
+        self.ol_first = 0
+        self.update_object_list(self.ol_selected)
+
+    def object_row_click(self, slot):
+        index = self.ol_first + slot
+        if index >= len(self.ol_ids) or self.select_viewer_func == None:
+            return
+        object_id = self.ol_ids[index]
+        self.select_viewer_func(object_id)
+
+        self.ol_rename.delete(0, 'end')
+        self.ol_rename.insert('end', self.objects[object_id].name)
+
+    def rename_click(self,):
+        if self.rename_env_func == None or self.ol_selected == None:
+            return
+        name = self.ol_rename.get()
+        self.rename_env_func(self.ol_selected, name)
+
+        # keep the object name field from writing the old name back
+        if self.last_object_viewed == self.ol_selected:
+            self.o_name.delete(0, 'end')
+            self.o_name.insert('end', name)
+
+    def update_object_stats(self, stats):
+
+        # summaries are cached until the object changes, so this is a no op while hovering the same object
+        if stats is self.last_stats_viewed:
+            return
+        self.last_stats_viewed = stats
+
+        if stats == None:
+            self.o_stats.configure(text='')
+            return
+
+        min_x, min_y, max_x, max_y = stats['bbox']
+        lines = [f'Voxels: {stats["voxels"]}    Mass: {stats["mass"]:g}']
+        for name, count in stats['counts'].items():
+            if count > 0:
+                lines.append(f'{name}: {count}')
+        lines.append(f'Actuators: {stats["actuator_ratio"]*100:.1f}%')
+        lines.append(f'Bounding box: {max_x-min_x+1} x {max_y-min_y+1} at ({min_x}, {min_y})')
+        lines.append(f'Centroid: ({stats["centroid"][0]:.2f}, {stats["centroid"][1]:.2f})')
+        self.o_stats.configure(text='\n'.join(lines))
+
     def update_mode(self, key_presses):
         
         options = {
@@ -200,17 +540,42 @@ class GUI:
             'Vertical Actuator': utils.CELL_ACT_V,
             'Fixed Voxel': utils.CELL_FIXED}
 
+        tools = {
+            'Brush': utils.BRUSH,
+            'Rectangle Fill': utils.RECTANGLE,
+            'Flood Fill': utils.FLOOD,
+            'Stamp Pattern': utils.STAMP}
+        self.mode_data['tool'] = tools[self.tool_text.get()]
+
+        symmetries = {
+            'None': utils.SYMMETRY_NONE,
+            'Left-Right': utils.SYMMETRY_X,
+            'Top-Bottom': utils.SYMMETRY_Y,
+            'Both': utils.SYMMETRY_XY}
+        self.mode_data['symmetry'] = symmetries[self.sym_text.get()]
+
+        # a blank or invalid axis mirrors around the grid center
+        axes = []
+        for entry in [self.sym_x_entry, self.sym_y_entry]:
+            try:
+                axes.append(float(entry.get()))
+            except ValueError:
+                axes.append(None)
+        self.mode_data['symmetry_axis'] = tuple(axes)
+
         if self.mode_data['mode'] == utils.VOXELS:
             self.mode_data['selector'] = options[self.vs_text.get()]
 
             if self.mode_data['mode'] != self.old_mode:
                 self.o_frame.pack_forget()
-                self.vs_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad)
+                self.vs_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad, before=self.sym_frame)
+                self.tool_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad, before=self.sym_frame)
                 self.o_frame.pack(side='top', fill='x', pady=self.vpad, padx=self.hpad)
         else:
             self.mode_data['selector'] = None
             if self.mode_data['mode'] != self.old_mode:
                 self.vs_frame.pack_forget()  
+                self.tool_frame.pack_forget()
         
         self.old_mode = self.mode_data['mode']
 
@@ -234,14 +599,15 @@ class GUI:
             return
         self.load_env_func(file_name)
         self.load_viewer_func(file_name)
+        self.watcher.watch_file(file_name)
 
         self.last_object_viewed = None
-        self.objects = {}
 
     def save(self, file_name):
         if self.save_env_func == None:
             return
         self.save_env_func(file_name)
+        self.watcher.watch_file(file_name)
 
     def update_gs_click(self,):
         try:
@@ -279,6 +645,172 @@ class GUI:
         else:
             self.load(load_path)
 
+    def browse_click(self,):
+        if self.gallery != None and self.gallery.is_open:
+            self.gallery.window.lift()
+            return
+
+        if self.thumbnails == None:
+            self.thumbnails = thumbnail_cache.ThumbnailCache(
+                os.path.join(self.save_path, '.thumbnails'),
+                lambda data: PhotoImage(data=base64.b64encode(data)))
+        self.gallery = gallery.Gallery(self.master, self.save_path, self.thumbnails, self.browse_pick)
+
+    def browse_pick(self, file_name):
+        self.pi_name.delete(0, 'end')
+        self.pi_name.insert('end', file_name)
+        self.load_click()
+
+    def similar_click(self,):
+        if self.features_env_func == None or self.similar_job != None:
+            return
+        self.similar_job = self.similar_pool.submit(self.find_similar, self.features_env_func())
+
+    def find_similar(self, features):
+        if self.similarity == None:
+            self.similarity = similarity_index.SimilarityIndex(os.path.join(self.save_path, '.similarity.npz'))
+        indexed, removed = self.similarity.update(self.save_path, workers=1)
+        if indexed > 0 or removed > 0:
+            self.similarity.save()
+        return self.similarity.query(features, 5)
+
+    def update_similar(self,):
+        if self.similar_job == None or not self.similar_job.done():
+            return
+        job = self.similar_job
+        self.similar_job = None
+        try:
+            results = job.result()
+        except Exception as e:
+            # e.g. no export directory yet, or an unreadable index, which is read again on the next search
+            self.similarity = None
+            mb.showerror(title='Error: Search Failed', message=f'Could not search {self.save_path} for similar designs: {e}')
+            return
+        if len(results) == 0:
+            mb.showinfo(title='Similar Designs', message=f'There are no designs in {self.save_path} to compare with.')
+            return
+        lines = [f'{os.path.basename(path)}  ({distance:.3f})' for path, distance in results]
+        mb.showinfo(title='Similar Designs', message='Closest to the editor contents:\n\n' + '\n'.join(lines))
+
+    def export_object_click(self,):
+        file_name = self.clean_name(self.eg_name.get())
+        if not self.export_object_env_func(os.path.join(self.save_path, file_name)):
+            mb.showerror(title='Error: Nothing to Export', message='Add at least one object before exporting.')
+
+    def robot_name(self,):
+        file_name = self.eg_name.get()
+        if not '.' in file_name:
+            return file_name + '.npz'
+        return file_name
+
+    def export_robot_click(self,):
+        file_name = self.robot_name()
+        if not self.export_robot_env_func(os.path.join(self.save_path, file_name)):
+            mb.showerror(title='Error: Nothing to Export', message='Add at least one voxel before exporting a robot.')
+
+    def import_robot_click(self,):
+        file_name = self.robot_name()
+        load_path = os.path.join(self.save_path, file_name)
+
+        if len(self.objects.items()) > 0:
+            if not mb.askokcancel(title='Overwrite Warning', message=f'Are you sure you want to overwrite editor contents with the robot in {file_name}?'):
+                return
+        if not self.import_robot_env_func(load_path):
+            mb.showerror(title='Error: Invalid Robot', message=f'Could not read a robot from {file_name}.')
+            return
+        self.load_viewer_func(load_path)
+        self.last_object_viewed = None
+
+    def compare_click(self,):
+        if self.arrays_env_func == None:
+            return
+
+        file_name = self.clean_name(self.df_name.get())
+        loaded_arrays = data_manager.DataManager().load_arrays(os.path.join(self.save_path, file_name))
+        if loaded_arrays == None:
+            mb.showerror(title='Error: Invalid File', message=f'Could not read {file_name}.')
+            return
+        self.compare_arrays = loaded_arrays
+        self.compare_dirty = True
+
+    def clear_compare_click(self,):
+        self.compare_arrays = None
+        if self.diff_viewer_func != None:
+            self.diff_viewer_func(None)
+
+    def update_compare(self, grid):
+        if self.compare_job != None:
+            if not self.compare_job[1].done():
+                return
+            compare_arrays, job = self.compare_job
+            self.compare_job = None
+            # a diff against a file that was cleared or replaced in the meantime is dropped
+            if compare_arrays is self.compare_arrays:
+                self.diff_viewer_func(job.result())
+
+        if self.compare_arrays == None:
+            return
+        size = (len(grid[0]), len(grid))
+        if not self.compare_dirty and size == self.compare_size:
+            return
+        self.compare_dirty = False
+        self.compare_size = size
+        self.compare_job = (self.compare_arrays, self.compare_pool.submit(design_diff.DesignDiff, self.compare_arrays, self.arrays_env_func()))
+
+    def load_pattern_click(self,):
+        if self.pattern_env_func == None:
+            return
+
+        file_name = self.clean_name(self.tool_pattern.get())
+        load_path = os.path.join(self.save_path, file_name)
+
+        if not self.pattern_env_func(load_path):
+            mb.showerror(title='Error: Invalid Pattern', message=f'Could not load a pattern from {file_name}. Patterns are saved designs with at least one voxel.')
+
+    def copy_click(self,):
+        if self.copy_env_func == None:
+            return
+        if not self.copy_env_func():
+            mb.showerror(title='Error: Nothing Selected', message=f'Select an object, or drag a rectangle in Select Mode, before copying.')
+
+    def cut_click(self,):
+        if self.cut_env_func == None:
+            return
+        if not self.cut_env_func():
+            mb.showerror(title='Error: Nothing Selected', message=f'Select an object, or drag a rectangle in Select Mode, before cutting.')
+
+    def paste_click(self,):
+        if self.paste_env_func == None:
+            return
+        if not self.paste_env_func():
+            mb.showerror(title='Error: Empty Clipboard', message=f'Copy or cut something before pasting. Pasting places the clipboard at the next clicked cell.')
+
+    def mirror_click(self,):
+        if self.mirror_env_func != None:
+            self.mirror_env_func()
+
+    def rotate_click(self,):
+        if self.rotate_env_func != None:
+            self.rotate_env_func()
+
+    def undo_click(self, event=None):
+        if self.undo_env_func == None:
+            return
+        self.sync_history_gs(self.undo_env_func())
+
+    def redo_click(self, event=None):
+        if self.redo_env_func == None:
+            return
+        self.sync_history_gs(self.redo_env_func())
+
+    def sync_history_gs(self, new_gs):
+        # the viewer has to follow when undoing or redoing a resize
+        if new_gs == None or self.gs_viewer_func == None:
+            return
+        new_width, new_height = new_gs
+        if new_width != self.old_gs_width or new_height != self.old_gs_height:
+            self.gs_viewer_func(new_width, new_height)
+
     def save_click(self):
 
         taken_names = {}
@@ -324,16 +856,42 @@ class GUI:
 
     def update(self, grid, objects, recently_updated_objects, hovered_object_id, selected_object_id, key_presses):
 
-        self.objects = {}
-        for object_id, obj in objects.items():
-            self.objects[object_id] = obj.copy()
-
         self.update_object_info(objects, recently_updated_objects, hovered_object_id, selected_object_id)
+        self.update_object_list(selected_object_id)
         self.update_gs_info(grid)
         self.update_mode(key_presses)
+        self.update_file_changes()
+        self.update_similar()
+        self.update_compare(grid)
+
+    def update_file_changes(self,):
+        for kind, path in self.watcher.poll():
+            if kind == file_watcher.DIRECTORY_CHANGED and self.gallery != None and self.gallery.is_open:
+                self.gallery.refresh()
+            if kind == file_watcher.FILE_CHANGED and not self.reload_asking and self.reload_job == None:
+                # asked from its own callback, so the editor keeps rendering while the dialog is open
+                self.reload_asking = True
+                self.master.after_idle(lambda path=path: self.ask_reload(path))
+
+        if self.reload_job == None or not self.reload_job[1].done():
+            return
 
-        self.master.update_idletasks()
-        self.master.update()
+        # the new state replaces the old one in a single step between frames
+        path, job = self.reload_job
+        self.reload_job = None
+        loaded_state = job.result()
+        if loaded_state == None:
+            mb.showerror(title='Error: Reload Failed', message=f'Could not read {os.path.basename(path)}.')
+            return
+        self.swap_env_func(loaded_state)
+        self.load_viewer_func(path)
+        self.last_object_viewed = None
+
+    def ask_reload(self, path):
+        file_name = os.path.basename(path)
+        if self.swap_env_func != None and mb.askyesno(title='File Changed', message=f'{file_name} was changed outside the editor. Reload it? Unsaved edits will be lost.'):
+            self.reload_job = (path, self.reload_pool.submit(data_manager.DataManager().load, path))
+        self.reload_asking = False
 
     def update_small(self):
         self.master.update_idletasks()
@@ -0,0 +1,110 @@
+from array import array
+from collections import deque
+
+# every record is six ints: op, index, old type, new type, old link mask, new link mask
+CELL = 0
+ADD_COL = 1
+REMOVE_COL = 2
+ADD_ROW = 3
+REMOVE_ROW = 4
+
+RECORD_SIZE = 6
+
+# link mask bits
+LINK_LEFT = 1
+LINK_RIGHT = 2
+LINK_UP = 4
+LINK_DOWN = 8
+
+class History:
+    """
+    Undo/redo journal storing per-action deltas instead of grid copies. Entries are (records, names) pairs, names
+    maps the position of a cell record to the (old, new) name of the object holding the cell, where that changed.
+
+    Args:
+        get_state (callable): maps a cell index to its current (type, link mask).
+        max_records (int): memory budget in records, oldest actions are dropped past it. (default = 250000)
+        get_name (callable): maps a cell index to the name of its object, None if it has none. (default = None)
+    """
+    def __init__(self, get_state, max_records=250000, get_name=None):
+        self.get_state = get_state
+        self.get_name = get_name
+        self.max_records = max_records
+
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.total_records = 0
+
+        self.entry = None
+        self.entry_names = {}
+        self.touched = {}
+        self.paused = False
+
+    def touch(self, index):
+        if self.paused or index in self.touched:
+            return
+        name = self.get_name(index) if self.get_name != None else None
+        self.touched[index] = self.get_state(index) + (name,)
+
+    def record_op(self, op, index):
+        if self.paused:
+            return
+        # cell indices are about to move, so close the records made in the old layout
+        self.flush()
+        self.entry.extend((op, index, 0, 0, 0, 0))
+
+    def flush(self,):
+        if self.entry == None:
+            self.entry = array('i')
+        for index, (old_type, old_mask, old_name) in self.touched.items():
+            new_type, new_mask = self.get_state(index)
+            if old_type != new_type or old_mask != new_mask:
+                new_name = self.get_name(index) if self.get_name != None else None
+                if old_name != new_name:
+                    self.entry_names[len(self.entry)] = (old_name, new_name)
+                self.entry.extend((CELL, index, old_type, new_type, old_mask, new_mask))
+        self.touched = {}
+
+    def commit(self,):
+        if self.entry == None and len(self.touched) == 0:
+            return
+        self.flush()
+        entry, self.entry = self.entry, None
+        names, self.entry_names = self.entry_names, {}
+        if len(entry) == 0:
+            return
+
+        self.undo_stack.append((entry, names))
+        self.total_records += len(entry)//RECORD_SIZE
+        for old_entry, old_names in self.redo_stack:
+            self.total_records -= len(old_entry)//RECORD_SIZE
+        self.redo_stack = []
+        self.enforce_budget()
+
+    def enforce_budget(self,):
+        while self.total_records > self.max_records and len(self.undo_stack) > 1:
+            self.total_records -= len(self.undo_stack.popleft()[0])//RECORD_SIZE
+
+    def pop_undo(self,):
+        self.commit()
+        if len(self.undo_stack) == 0:
+            return None
+        entry = self.undo_stack.pop()
+        self.redo_stack.append(entry)
+        return entry
+
+    def pop_redo(self,):
+        self.commit()
+        if len(self.redo_stack) == 0:
+            return None
+        entry = self.redo_stack.pop()
+        self.undo_stack.append(entry)
+        return entry
+
+    def clear(self,):
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.total_records = 0
+        self.entry = None
+        self.entry_names = {}
+        self.touched = {}
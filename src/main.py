@@ -2,10 +2,18 @@ import utils
 import viewer
 import env
 import gui
+import shared_grid
+import command_server
 
+import argparse
 import time
 from tkinter import Tk
 
+parser = argparse.ArgumentParser(description='Design tool for EvoGym worlds and robots.')
+parser.add_argument('--server', action='store_true', help='accept commands from scripts on a unix socket only this user can open')
+parser.add_argument('--server-port', type=int, default=None, help='accept commands on this local TCP port instead, clients first send the printed token')
+args = parser.parse_args()
+
 gui_master = Tk()
 gui_master.title('EvoGym Design Interface GUI')
 
@@ -18,40 +26,122 @@ gui_viewer.set_funcs(
     main_env.load, 
     main_viewer.load, 
     main_env.change_gs,
-    main_viewer.change_gs)
+    main_viewer.change_gs,
+    main_env.load_pattern)
 
-def main():
-    while not main_viewer.get_window_close():
-
-        main_viewer.update_and_render(
-            main_env.grid, main_env.objects,
-            main_env.node_to_object,
-            main_env.hovered_object_id,
-            main_env.selected_object_id,
-            main_env.just_altered,
-            main_env.mode)
-
-        main_env.update(
-            main_viewer.currently_hovered,
-            main_viewer.currently_selected,
-            main_viewer.mouse_press,
-            main_viewer.mouse_held,
-            main_viewer.get_key_presses(),
-            gui_viewer.mode_data)
-
-        gui_viewer.update(
-            main_env.grid, 
-            main_env.objects,
-            main_env.need_to_update_objects,
-            main_env.hovered_object_id, 
-            main_env.selected_object_id,
-            main_viewer.get_key_presses())
-
-        #utils.get_objects(main_env.grid)
-        #time.sleep(1)
-
-        # print(main_viewer.get_key_presses())
+gui_viewer.set_clipboard_funcs(
+    main_env.copy_selection,
+    main_env.cut_selection,
+    main_env.arm_paste,
+    main_env.mirror_clipboard,
+    main_env.rotate_clipboard)
+
+gui_viewer.set_history_funcs(
+    main_env.undo,
+    main_env.redo)
+
+gui_viewer.set_stats_func(main_env.get_object_stats)
+gui_viewer.set_reload_func(main_env.set_state)
+gui_viewer.set_similar_func(main_env.get_features)
+gui_viewer.set_export_funcs(
+    main_env.export_object,
+    main_env.export_robot,
+    main_env.import_robot)
+gui_viewer.set_diff_funcs(main_env.get_arrays, main_viewer.set_diff)
+
+gui_viewer.set_object_funcs(
+    main_env.rename_object,
+    lambda object_id: main_viewer.select_object(main_env.grid, main_env.objects, object_id))
+main_env.add_object_listener(gui_viewer.objects_changed)
+main_env.add_commit_listener(gui_viewer.grid_changed)
+
+# every committed edit is mirrored to shared memory for trainers running next to the editor
+grid_publisher = shared_grid.SharedGridPublisher()
+def publish_grid(grid):
+    conn_h, conn_v = utils.get_connections(grid)
+    grid_publisher.publish(utils.get_types(grid), conn_h, conn_v)
+publish_grid(main_env.grid)
+main_env.add_commit_listener(publish_grid)
+
+# scripts drive the editor over a local socket when asked to, their batches run in the input step below
+server = None
+if args.server or args.server_port != None:
+    server = command_server.start_server(port=args.server_port, save_path=gui_viewer.save_path)
+if server != None:
+    main_env.add_object_listener(server.objects_changed)
+    print(f'Listening for commands on {server.address}' + (f' with token {server.token}' if server.token != None else ''))
+
+# input and edits run faster than the screen is redrawn so fast strokes stay smooth,
+# the Tk side only has to keep up with what a person can read
+scheduler = utils.FrameScheduler({'input': 60, 'render': 30, 'gui': 30, 'stats': 1})
+
+# the GUI steps less often than the env, so remember object updates it hasn't seen yet
+objects_updated = False
 
+def step():
+    global objects_updated
+
+    if main_viewer.get_window_close():
+        gui_master.quit()
+        return
+
+    try:
+        if scheduler.due('input'):
+            main_viewer.update_input(
+                main_env.grid,
+                main_env.node_to_object,
+                main_env.just_altered,
+                main_env.altered_nodes)
+
+            main_env.update(
+                main_viewer.currently_hovered,
+                main_viewer.currently_selected,
+                main_viewer.mouse_press,
+                main_viewer.mouse_held,
+                main_viewer.mouse_release,
+                main_viewer.stroke,
+                main_viewer.get_key_presses(),
+                gui_viewer.mode_data)
+            objects_updated = objects_updated or main_env.need_to_update_objects
+            if server != None and server.run_batches(main_env, main_viewer):
+                objects_updated = True
+
+        if scheduler.due('render'):
+            main_viewer.render(
+                main_env.grid,
+                main_env.objects,
+                main_env.node_to_object,
+                main_env.hovered_object_id,
+                main_env.selected_object_id,
+                main_env.get_region(),
+                main_env.mode,
+                main_env.get_symmetry_axes())
+            scheduler.frame_done()
+
+        # measured frame times go in the window title, once a second so the title bar doesn't flicker
+        if scheduler.due('stats'):
+            main_viewer.show_frame_stats(scheduler.get_stats())
+
+        if scheduler.due('gui'):
+            gui_viewer.update(
+                main_env.grid, 
+                main_env.objects,
+                objects_updated,
+                main_env.hovered_object_id, 
+                main_env.selected_object_id,
+                main_viewer.get_key_presses())
+            objects_updated = False
+    finally:
+        # Tk handles its own events while waiting for the next step, rescheduled even if this one failed
+        gui_master.after(int(scheduler.get_delay()*1000) + 1, step)
+
+def main():
+    gui_master.after(0, step)
+    gui_master.mainloop()
+    grid_publisher.close()
+    if server != None:
+        server.close()
     main_viewer.safe_close()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,111 @@
+import utils
+
+TYPE_NAMES = {
+    utils.CELL_RIGID: 'Rigid',
+    utils.CELL_SOFT: 'Soft',
+    utils.CELL_ACT_H: 'Horizontal Actuator',
+    utils.CELL_ACT_V: 'Vertical Actuator',
+    utils.CELL_FIXED: 'Fixed'}
+
+class ObjectStats:
+    """
+    Running statistics of one object, kept up to date voxel by voxel as the object is edited. Retyping a voxel only
+    adjusts two counters, removing one that was on the edge of the bounding box only marks the box for shrinking,
+    and the summary shown in the GUI is rebuilt the next time it is asked for after something changed.
+    """
+    def __init__(self):
+        self.counts = [0]*(utils.CELL_FIXED+1)
+        self.total = 0
+        self.sum_x = 0
+        self.sum_y = 0
+
+        # voxels per column and row, the bounding box is recomputed from them after it shrank
+        self.columns = {}
+        self.rows = {}
+        self.bbox = None
+
+        self.summary = None
+
+    def add(self, x, y, type):
+        self.counts[type] += 1
+        self.total += 1
+        self.sum_x += x
+        self.sum_y += y
+        self.columns[x] = self.columns.get(x, 0) + 1
+        self.rows[y] = self.rows.get(y, 0) + 1
+        if self.total == 1:
+            self.bbox = (x, y, x, y)
+        elif self.bbox != None:
+            min_x, min_y, max_x, max_y = self.bbox
+            self.bbox = (min(min_x, x), min(min_y, y), max(max_x, x), max(max_y, y))
+        self.summary = None
+
+    def remove(self, x, y, type):
+        self.counts[type] -= 1
+        self.total -= 1
+        self.sum_x -= x
+        self.sum_y -= y
+        self.columns[x] -= 1
+        if self.columns[x] == 0:
+            del self.columns[x]
+            if self.bbox != None and (x == self.bbox[0] or x == self.bbox[2]):
+                self.bbox = None
+        self.rows[y] -= 1
+        if self.rows[y] == 0:
+            del self.rows[y]
+            if self.bbox != None and (y == self.bbox[1] or y == self.bbox[3]):
+                self.bbox = None
+        self.summary = None
+
+    def set_type(self, old_type, new_type):
+        self.counts[old_type] -= 1
+        self.counts[new_type] += 1
+        self.summary = None
+
+    def merge(self, other):
+        for type in range(len(self.counts)):
+            self.counts[type] += other.counts[type]
+        self.total += other.total
+        self.sum_x += other.sum_x
+        self.sum_y += other.sum_y
+        for x, count in other.columns.items():
+            self.columns[x] = self.columns.get(x, 0) + count
+        for y, count in other.rows.items():
+            self.rows[y] = self.rows.get(y, 0) + count
+        if self.bbox != None and other.bbox != None:
+            self.bbox = (min(self.bbox[0], other.bbox[0]), min(self.bbox[1], other.bbox[1]),
+                max(self.bbox[2], other.bbox[2]), max(self.bbox[3], other.bbox[3]))
+        else:
+            self.bbox = None
+        self.summary = None
+
+    def get_bbox(self,):
+        if self.bbox == None and self.total > 0:
+            self.bbox = (min(self.columns), min(self.rows), max(self.columns), max(self.rows))
+        return self.bbox
+
+    def get_summary(self,):
+        if self.summary != None:
+            return self.summary
+        if self.total == 0:
+            return None
+
+        actuators = self.counts[utils.CELL_ACT_H] + self.counts[utils.CELL_ACT_V]
+
+        # every voxel has the same density, so mass is counted in voxels and the centroid is the center of mass
+        self.summary = {
+            'voxels': self.total,
+            'counts': {name: self.counts[type] for type, name in TYPE_NAMES.items()},
+            'actuator_ratio': actuators/self.total,
+            'bbox': self.get_bbox(),
+            'centroid': (self.sum_x/self.total + 0.5, self.sum_y/self.total + 0.5),
+            'mass': float(self.total)}
+        return self.summary
+
+def make_stats(grid, nodes):
+    grid_width = len(grid[0])
+
+    stats = ObjectStats()
+    for node_id in nodes:
+        stats.add(node_id%grid_width, node_id//grid_width, utils.get_node_by_index(grid, node_id).type)
+    return stats
@@ -0,0 +1,62 @@
+import numpy as np
+
+import colors
+import utils
+
+def rasterize(types, conn_h, conn_v, cell_size=8, border_size=1):
+    grid_height, grid_width = types.shape
+    filled = types != utils.CELL_EMPTY
+
+    palette = np.array(colors.VOXEL_COLORS, dtype=np.float32)
+    grid_color = np.array(colors.GRID_COLOR, dtype=np.float32)
+    edge_color = np.array(colors.EDGE_FULL, dtype=np.float32)
+
+    # as in Viewer, a voxel covers its own box plus the border to its left and above it
+    padded_filled = np.pad(filled, ((0, 1), (0, 1)))
+    padded_types = np.pad(types, ((0, 1), (0, 1)))
+
+    def covered(mask, cell_types):
+        out = np.broadcast_to(grid_color, mask.shape + (3,)).copy()
+        out[mask] = palette[cell_types[mask]]
+        return out
+
+    interiors = palette[types]
+    v_strips = covered(padded_filled[:-1, :], padded_types[:-1, :])
+    h_strips = covered(padded_filled[:, :-1], padded_types[:, :-1])
+    corners = covered(padded_filled, padded_types)
+
+    # unconnected sides of filled voxels, including the outer boundary
+    both_h = filled[:, :-1] & filled[:, 1:] & conn_h
+    both_v = filled[:-1, :] & filled[1:, :] & conn_v
+    any_h = np.pad(filled, ((0, 0), (1, 0))) | np.pad(filled, ((0, 0), (0, 1)))
+    any_v = np.pad(filled, ((1, 0), (0, 0))) | np.pad(filled, ((0, 1), (0, 0)))
+    v_edges = any_h & ~np.pad(both_h, ((0, 0), (1, 1)))
+    h_edges = any_v & ~np.pad(both_v, ((1, 1), (0, 0)))
+
+    # edge bars run across the corners at both of their ends
+    padded_v_edges = np.pad(v_edges, ((1, 1), (0, 0)))
+    padded_h_edges = np.pad(h_edges, ((0, 0), (1, 1)))
+    corner_edges = padded_v_edges[:-1] | padded_v_edges[1:] | padded_h_edges[:, :-1] | padded_h_edges[:, 1:]
+
+    v_strips[v_edges] = edge_color
+    h_strips[h_edges] = edge_color
+    corners[corner_edges] = edge_color
+
+    # interleave into a (2h+1, 2w+1) layout of borders and boxes
+    tiles = np.empty((2*grid_height+1, 2*grid_width+1, 3), dtype=np.float32)
+    tiles[0::2, 0::2] = corners
+    tiles[0::2, 1::2] = h_strips
+    tiles[1::2, 0::2] = v_strips
+    tiles[1::2, 1::2] = interiors
+
+    rows = np.full(2*grid_height+1, border_size)
+    rows[1::2] = cell_size
+    cols = np.full(2*grid_width+1, border_size)
+    cols[1::2] = cell_size
+
+    image = np.repeat(np.repeat(tiles, rows, axis=0), cols, axis=1)
+    return np.round(image*255).astype(np.uint8)
+
+def rasterize_grid(grid, cell_size=8, border_size=1):
+    conn_h, conn_v = utils.get_connections(grid)
+    return rasterize(utils.get_types(grid), conn_h, conn_v, cell_size, border_size)
@@ -0,0 +1,51 @@
+import argparse
+import os
+import glob
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+import data_manager
+import rasterizer
+
+def render_file(job):
+    in_path, out_path, cell_size, border_size = job
+
+    loaded_arrays = data_manager.DataManager().load_arrays(in_path)
+    if loaded_arrays == None:
+        return in_path, False
+
+    types, conn_h, conn_v, labels, names = loaded_arrays
+    image = rasterizer.rasterize(types, conn_h, conn_v, cell_size, border_size)
+    Image.fromarray(image).save(out_path)
+    return in_path, True
+
+def main():
+    parser = argparse.ArgumentParser(description='Render PNG thumbnails of every design in a directory.')
+    parser.add_argument('--input', default='exported', help='directory of design files (default: exported)')
+    parser.add_argument('--output', default=os.path.join('exported', 'thumbnails'), help='directory to write thumbnails to (default: exported/thumbnails)')
+    parser.add_argument('--cell-size', type=int, default=8, help='voxel size in pixels (default: 8)')
+    parser.add_argument('--border-size', type=int, default=1, help='border size in pixels (default: 1)')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: one per cpu)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)
+
+    jobs = []
+    for in_path in sorted(glob.glob(os.path.join(args.input, '*.json'))):
+        name = os.path.splitext(os.path.basename(in_path))[0]
+        jobs.append((in_path, os.path.join(args.output, name + '.png'), args.cell_size, args.border_size))
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for in_path, success in pool.map(render_file, jobs, chunksize=16):
+            if not success:
+                failed.append(in_path)
+
+    print(f'Rendered {len(jobs)-len(failed)} of {len(jobs)} designs to {args.output}.')
+    for in_path in failed:
+        print(f'Could not render {in_path}.')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import os
+import glob
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import utils
+import data_manager
+
+def load_pattern(file_path):
+    loaded_arrays = data_manager.DataManager().load_arrays(file_path)
+    if loaded_arrays == None:
+        return None
+
+    # crop to the bounding box of the filled cells, same as the stamp tool
+    types = loaded_arrays[0]
+    ys, xs = np.nonzero(types)
+    if len(ys) == 0:
+        return None
+    return types[ys.min():ys.max()+1, xs.min():xs.max()+1]
+
+def find_matches(types, pattern, exact=False):
+    """
+    Finds every placement of a type pattern in a grid of types.
+
+    Args:
+        types (np.ndarray): (H, W) cell types of a design.
+        pattern (np.ndarray): (h, w) cell types to look for.
+        exact (bool): whether empty pattern cells have to be empty too, otherwise they match anything. (default = False)
+
+    Returns:
+        np.ndarray: (N, 2) x, y of the top left corner of every match.
+    """
+    height, width = pattern.shape
+    if types.shape[0] < height or types.shape[1] < width:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    windows = sliding_window_view(types, (height, width))
+    matched = windows == pattern
+    if not exact:
+        matched |= pattern == utils.CELL_EMPTY
+    ys, xs = np.nonzero(matched.all(axis=(2, 3)))
+    return np.stack([xs, ys], axis=1)
+
+def search_file(job):
+    path, pattern, exact = job
+
+    loaded_arrays = data_manager.DataManager().load_arrays(path)
+    if loaded_arrays == None:
+        return path, None
+
+    types, conn_h, conn_v, labels, names = loaded_arrays
+    filled = pattern != utils.CELL_EMPTY
+    height, width = pattern.shape
+
+    results = []
+    for x, y in find_matches(types, pattern, exact).tolist():
+        window = labels[y:y+height, x:x+width][filled]
+        objects = sorted({names[label] for label in window.tolist() if label >= 0})
+        results.append((x, y, objects))
+    return path, results
+
+def main():
+    parser = argparse.ArgumentParser(description='Find every design in a directory that contains a pattern of voxel types.')
+    parser.add_argument('pattern', help='design file holding the pattern, cropped to its filled cells')
+    parser.add_argument('--input', default='exported', help='directory of design files (default: exported)')
+    parser.add_argument('--exact', action='store_true', help='empty pattern cells must be empty in the match too')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: one per cpu)')
+    args = parser.parse_args()
+
+    pattern = load_pattern(args.pattern)
+    if pattern is None:
+        print(f'Could not load a pattern from {args.pattern}.')
+        return
+
+    jobs = [(path, pattern, args.exact) for path in sorted(glob.glob(os.path.join(args.input, '*.json')))]
+
+    match_count, file_count = 0, 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for path, results in pool.map(search_file, jobs, chunksize=16):
+            if results == None:
+                print(f'Could not read {path}.')
+                continue
+            if len(results) > 0:
+                file_count += 1
+            for x, y, objects in results:
+                match_count += 1
+                print(f'{path}\tx={x}\ty={y}\t{", ".join(objects)}')
+
+    print(f'{match_count} matches in {file_count} of {len(jobs)} designs.')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+DEFAULT_NAME = 'evogym_design_tool'
+
+MAGIC = 0x45474454
+# int64 header fields
+H_MAGIC = 0
+H_SEQUENCE = 1
+H_WIDTH = 2
+H_HEIGHT = 3
+H_CAPACITY = 4
+H_STALE = 5
+HEADER_SIZE = 64
+
+# values of the stale field
+STALE_MOVED = 1
+STALE_CLOSED = 2
+
+def get_views(buf, capacity):
+    header = np.ndarray((HEADER_SIZE//8,), dtype=np.int64, buffer=buf)
+    types = np.ndarray((capacity,), dtype=np.uint8, buffer=buf, offset=HEADER_SIZE)
+    conn_h = np.ndarray((capacity,), dtype=bool, buffer=buf, offset=HEADER_SIZE + capacity)
+    conn_v = np.ndarray((capacity,), dtype=bool, buffer=buf, offset=HEADER_SIZE + 2*capacity)
+    return header, types, conn_h, conn_v
+
+class SharedGridPublisher:
+    """
+    Publishes the editor's types and connection arrays to a shared memory block, so a trainer or simulator on the
+    same machine sees every committed edit without reading files. Writes are guarded by a sequence counter that is
+    odd while a write is in progress, readers retry if it changed under them. When a grid outgrows the block, the
+    old block is marked stale and a larger one is created under the same name.
+
+    Args:
+        name (str): name of the shared memory block. (default = DEFAULT_NAME)
+        capacity (int): number of cells to reserve up front. (default = 4096)
+    """
+    def __init__(self, name=DEFAULT_NAME, capacity=4096):
+        self.name = name
+        self.sequence = 0
+        self.block = None
+        self.create(capacity)
+
+    def create(self, capacity):
+        try:
+            block = shared_memory.SharedMemory(name=self.name, create=True, size=HEADER_SIZE + 3*capacity)
+        except FileExistsError:
+            # left behind by an editor that did not shut down cleanly, or the block being outgrown
+            old_block = shared_memory.SharedMemory(name=self.name)
+            if old_block.size >= HEADER_SIZE:
+                np.ndarray((HEADER_SIZE//8,), dtype=np.int64, buffer=old_block.buf)[H_STALE] = STALE_MOVED
+            old_block.close()
+            old_block.unlink()
+            block = shared_memory.SharedMemory(name=self.name, create=True, size=HEADER_SIZE + 3*capacity)
+
+        self.block = block
+        self.capacity = capacity
+        self.header, self.types, self.conn_h, self.conn_v = get_views(block.buf, capacity)
+        self.header[:] = 0
+        self.header[H_CAPACITY] = capacity
+        self.header[H_SEQUENCE] = self.sequence
+        self.header[H_MAGIC] = MAGIC
+
+    def publish(self, types, conn_h, conn_v):
+        """
+        Args:
+            types (np.ndarray): (H, W) cell types, see utils.get_types.
+            conn_h (np.ndarray): (H, W-1) horizontal connections.
+            conn_v (np.ndarray): (H-1, W) vertical connections.
+        """
+        if types.size > self.capacity:
+            self.release(STALE_MOVED)
+            self.create(max(types.size, 2*self.capacity))
+
+        self.sequence += 1
+        self.header[H_SEQUENCE] = self.sequence
+        self.header[H_HEIGHT], self.header[H_WIDTH] = types.shape
+        self.types[:types.size] = types.ravel()
+        self.conn_h[:conn_h.size] = conn_h.ravel()
+        self.conn_v[:conn_v.size] = conn_v.ravel()
+        self.sequence += 1
+        self.header[H_SEQUENCE] = self.sequence
+
+    def get_version(self,):
+        return self.sequence//2
+
+    def release(self, stale):
+        # a moved block is unlinked by create once its replacement can take the name
+        self.header[H_STALE] = stale
+        self.header = self.types = self.conn_h = self.conn_v = None
+        self.block.close()
+        if stale == STALE_CLOSED:
+            self.block.unlink()
+        self.block = None
+
+    def close(self,):
+        if self.block != None:
+            self.release(STALE_CLOSED)
+
+class SharedGridClient:
+    """
+    Reads the arrays published by a running editor. get_views maps them without copying, read takes a consistent
+    copy.
+
+    Args:
+        name (str): name of the shared memory block. (default = DEFAULT_NAME)
+    """
+    def __init__(self, name=DEFAULT_NAME):
+        self.name = name
+        self.block = None
+        self.attach()
+
+    def attach(self,):
+        try:
+            block = shared_memory.SharedMemory(name=self.name, track=False)
+        except TypeError:
+            # before python 3.13 every attached process would unlink the block when it exits
+            block = shared_memory.SharedMemory(name=self.name)
+            resource_tracker.unregister(block._name, 'shared_memory')
+
+        header = np.ndarray((HEADER_SIZE//8,), dtype=np.int64, buffer=block.buf)
+        if header[H_MAGIC] != MAGIC:
+            del header
+            block.close()
+            raise ValueError(f'{self.name} is not a grid published by the design tool.')
+        self.block = block
+        self.header, self.types, self.conn_h, self.conn_v = get_views(block.buf, int(header[H_CAPACITY]))
+
+    def reattach(self,):
+        # the editor outgrew the block and moved to a new one under the same name, or it was closed and
+        # attaching fails unless another editor took its place
+        stale = int(self.header[H_STALE])
+        self.close()
+        deadline = time.monotonic() + 1.0
+        while self.block == None:
+            try:
+                self.attach()
+            except (FileNotFoundError, ValueError):
+                # a new block has no magic until the editor finished setting it up
+                if stale == STALE_CLOSED or time.monotonic() > deadline:
+                    raise
+                time.sleep(0.001)
+
+    def get_version(self,):
+        """
+        Returns:
+            int: number of publishes so far, changes after every committed edit in the editor.
+        """
+        if self.header[H_STALE]:
+            self.reattach()
+        return int(self.header[H_SEQUENCE])//2
+
+    def get_views(self,):
+        """
+        Maps the published arrays without copying. They change under the caller on the next publish, so check
+        is_current with the returned version after using them.
+
+        Returns:
+            (np.ndarray, np.ndarray, np.ndarray, int): types, conn_h, conn_v, version.
+        """
+        while True:
+            if self.header[H_STALE]:
+                self.reattach()
+            sequence = int(self.header[H_SEQUENCE])
+            if sequence%2 == 1:
+                time.sleep(0)
+                continue
+            height, width = int(self.header[H_HEIGHT]), int(self.header[H_WIDTH])
+            if height*width > len(self.types):
+                continue
+            views = (self.types[:height*width].reshape(height, width),
+                self.conn_h[:height*max(0, width-1)].reshape(height, max(0, width-1)),
+                self.conn_v[:max(0, height-1)*width].reshape(max(0, height-1), width))
+            if int(self.header[H_SEQUENCE]) == sequence:
+                return views + (sequence//2,)
+
+    def is_current(self, version):
+        return not self.header[H_STALE] and int(self.header[H_SEQUENCE]) == version*2
+
+    def read(self,):
+        """
+        Returns:
+            (np.ndarray, np.ndarray, np.ndarray, int): copies of types, conn_h, conn_v, and their version.
+        """
+        while True:
+            types, conn_h, conn_v, version = self.get_views()
+            arrays = (types.copy(), conn_h.copy(), conn_v.copy())
+            if self.is_current(version):
+                return arrays + (version,)
+
+    def wait(self, version, timeout=None):
+        """
+        Blocks until the editor publishes something newer than version.
+
+        Returns:
+            bool: whether a newer version arrived before the timeout.
+        """
+        deadline = None if timeout == None else time.monotonic() + timeout
+        while self.get_version() <= version:
+            if deadline != None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self,):
+        if self.block != None:
+            self.header = self.types = self.conn_h = self.conn_v = None
+            try:
+                self.block.close()
+            except BufferError:
+                # views handed out by get_views are still alive, the mapping goes away with them
+                pass
+            self.block = None
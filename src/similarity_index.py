@@ -0,0 +1,188 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import utils
+import data_manager
+
+OCCUPANCY_SIZE = 8
+FEATURE_SIZE = 5 + 5 + OCCUPANCY_SIZE*OCCUPANCY_SIZE + 1
+
+def get_features(types, conn_h, conn_v):
+    """
+    Describes the shape of a design with a fixed size vector, so similar designs end up close together.
+
+    Args:
+        types (np.ndarray): (H, W) cell types.
+        conn_h (np.ndarray): (H, W-1) horizontal connections.
+        conn_v (np.ndarray): (H-1, W) vertical connections.
+
+    Returns:
+        np.ndarray: float32 vector of FEATURE_SIZE values. Type fractions, size independent shape moments, an
+        occupancy map of the bounding box and the fraction of neighboring voxels that are connected.
+    """
+    features = np.zeros(FEATURE_SIZE, dtype=np.float32)
+    filled = types != utils.CELL_EMPTY
+    count = int(filled.sum())
+    if count == 0:
+        return features
+
+    histogram = np.bincount(types[filled], minlength=utils.CELL_FIXED+1)[1:]/count
+
+    ys, xs = np.nonzero(filled)
+    height, width = ys.max()-ys.min()+1, xs.max()-xs.min()+1
+    size = max(height, width)
+    dx, dy = (xs - xs.mean())/size, (ys - ys.mean())/size
+    moments = [count/(height*width), width/(width+height), (dx*dx).mean(), (dy*dy).mean(), (dx*dy).mean()]
+
+    # bounding box padded to a square and averaged down to a fixed grid, so the aspect ratio survives
+    square = np.zeros((size, size), dtype=np.float32)
+    square[:height, :width] = filled[ys.min():ys.max()+1, xs.min():xs.max()+1]
+    bins = (np.arange(size)*OCCUPANCY_SIZE)//size
+    pool = np.zeros((OCCUPANCY_SIZE, size), dtype=np.float32)
+    pool[bins, np.arange(size)] = 1
+    pool /= np.maximum(pool.sum(axis=1, keepdims=True), 1)
+    occupancy = pool @ square @ pool.T
+
+    pairs_h = filled[:, :-1] & filled[:, 1:]
+    pairs_v = filled[:-1, :] & filled[1:, :]
+    pairs = int(pairs_h.sum() + pairs_v.sum())
+    connected = int((conn_h & pairs_h).sum() + (conn_v & pairs_v).sum())
+
+    features[0:5] = histogram
+    features[5:10] = moments
+    # scaled so the occupancy map weighs about as much as each of the other groups
+    features[10:-1] = occupancy.ravel()/OCCUPANCY_SIZE
+    features[-1] = connected/pairs if pairs > 0 else 0
+    return features
+
+def get_file_features(path):
+    loaded_arrays = data_manager.DataManager().load_arrays(path)
+    if loaded_arrays == None:
+        return path, None
+    types, conn_h, conn_v, labels, names = loaded_arrays
+    return path, get_features(types, conn_h, conn_v)
+
+def get_stamp(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+class SimilarityIndex:
+    """
+    Shape features of every design in a directory, saved to an npz file. Updating only extracts features of files
+    that were added or changed since the last update, and queries are a single distance computation over all rows.
+
+    Args:
+        path (str): npz file the index is loaded from and saved to.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.paths = []
+        self.stamps = np.zeros((0, 2), dtype=np.int64)
+        self.features = np.zeros((0, FEATURE_SIZE), dtype=np.float32)
+
+        if os.path.exists(path):
+            with np.load(path) as data:
+                if data['features'].shape[1] == FEATURE_SIZE:
+                    self.paths = data['paths'].tolist()
+                    self.stamps = data['stamps']
+                    self.features = data['features']
+
+    def save(self,):
+        # write under a temporary name first so a crash never leaves half an index
+        tmp_path = self.path + '.tmp.npz'
+        np.savez(tmp_path, paths=np.array(self.paths, dtype=str), stamps=self.stamps, features=self.features)
+        os.replace(tmp_path, self.path)
+
+    def update(self, directory, workers=None):
+        """
+        Brings the index up to date with a directory of designs.
+
+        Args:
+            directory (str): directory of design files.
+            workers (int): number of worker processes, 1 extracts on the calling thread. (default = None, one per cpu)
+
+        Returns:
+            (int, int): number of designs (re)indexed and removed.
+        """
+        current = {}
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith('.json'):
+                current[entry.path] = get_stamp(entry.path)
+
+        keep = []
+        indexed = {}
+        for row, path in enumerate(self.paths):
+            if path in current and tuple(self.stamps[row]) == current[path]:
+                keep.append(row)
+                indexed[path] = True
+        removed = len(self.paths) - len(keep)
+        changed = sorted(path for path in current if not path in indexed)
+
+        if workers == 1:
+            results = [get_file_features(path) for path in changed]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(get_file_features, changed, chunksize=16))
+        results = [(path, features) for path, features in results if features is not None]
+
+        self.paths = [self.paths[row] for row in keep] + [path for path, features in results]
+        self.stamps = np.concatenate([self.stamps[keep], np.array([current[path] for path, features in results], dtype=np.int64).reshape(-1, 2)])
+        self.features = np.concatenate([self.features[keep], np.array([features for path, features in results], dtype=np.float32).reshape(-1, FEATURE_SIZE)])
+        return len(results), removed
+
+    def query(self, features, k=5, exclude=None):
+        """
+        Args:
+            features (np.ndarray): features of the design to compare against, see get_features.
+            k (int): number of designs to return. (default = 5)
+            exclude (str): path to leave out, e.g. the query design itself. (default = None)
+
+        Returns:
+            list: (path, distance) of the k closest designs, closest first.
+        """
+        distances = np.linalg.norm(self.features - features, axis=1)
+        if exclude != None and exclude in self.paths:
+            distances[self.paths.index(exclude)] = np.inf
+
+        k = min(k, len(distances))
+        if k == 0:
+            return []
+        closest = np.argpartition(distances, k-1)[:k]
+        closest = closest[np.argsort(distances[closest])]
+        return [(self.paths[row], float(distances[row])) for row in closest if np.isfinite(distances[row])]
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the designs most similar to a given design.')
+    parser.add_argument('design', nargs='?', default=None, help='design file to look up, leave out to only update the index')
+    parser.add_argument('--input', default='exported', help='directory of design files (default: exported)')
+    parser.add_argument('--index', default=None, help='index file (default: .similarity.npz in the input directory)')
+    parser.add_argument('-k', type=int, default=5, help='number of designs to return (default: 5)')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: one per cpu)')
+    args = parser.parse_args()
+
+    index_path = args.index if args.index != None else os.path.join(args.input, '.similarity.npz')
+    index = SimilarityIndex(index_path)
+    indexed, removed = index.update(args.input, args.workers)
+    index.save()
+    print(f'Indexed {indexed} new or changed designs, removed {removed}, {len(index.paths)} in total.')
+
+    if args.design == None:
+        return
+
+    path, features = get_file_features(args.design)
+    if features is None:
+        print(f'Could not read {args.design}.')
+        return
+
+    exclude = None
+    for indexed_path in index.paths:
+        if os.path.abspath(indexed_path) == os.path.abspath(args.design):
+            exclude = indexed_path
+    for path, distance in index.query(features, args.k, exclude):
+        print(f'{distance:.4f}\t{path}')
+
+if __name__ == "__main__":
+    main()
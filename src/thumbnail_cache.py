@@ -0,0 +1,118 @@
+import os
+import io
+import hashlib
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+import data_manager
+import rasterizer
+
+def make_thumbnail(path, cache_dir, size, cell_size, border_size):
+    with open(path, 'rb') as f:
+        key = hashlib.sha1(f.read()).hexdigest()
+
+    cache_path = os.path.join(cache_dir, key + '.png')
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            return f.read()
+
+    loaded_arrays = data_manager.DataManager().load_arrays(path)
+    if loaded_arrays == None:
+        return None
+
+    types, conn_h, conn_v, labels, names = loaded_arrays
+    image = Image.fromarray(rasterizer.rasterize(types, conn_h, conn_v, cell_size, border_size))
+    image.thumbnail((size, size))
+
+    out = io.BytesIO()
+    image.save(out, format='PNG')
+    data = out.getvalue()
+
+    # write under a temporary name first so a reader never sees half a file
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, cache_path)
+    return data
+
+class ThumbnailCache:
+    """
+    Design thumbnails rendered on a thread pool. PNGs are cached on disk keyed by the hash of the design file, and
+    the most recently used images are kept in memory. Only poll touches the in-memory images, so it can run on the
+    Tk thread while files are read and parsed in the workers.
+
+    Args:
+        cache_dir (str): directory for cached PNGs.
+        to_image (callable): turns PNG bytes into whatever the caller displays, called from poll. (default = None, keeps the bytes)
+        max_images (int): number of images kept in memory. (default = 256)
+        size (int): maximum thumbnail width and height in pixels. (default = 96)
+        workers (int): number of worker threads. (default = 4)
+    """
+    def __init__(self, cache_dir, to_image=None, max_images=256, size=96, workers=4):
+        self.cache_dir = cache_dir
+        self.to_image = to_image if to_image != None else (lambda data: data)
+        self.max_images = max_images
+        self.size = size
+
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.results = queue.Queue()
+        self.pending = {}
+        self.images = OrderedDict()
+
+    def get(self, path, mtime):
+        """
+        Returns the thumbnail of a design if it is in memory, otherwise starts rendering it and returns None. A
+        failed design comes back as False.
+        """
+        key = (path, mtime)
+        if key in self.images:
+            self.images.move_to_end(key)
+            return self.images[key]
+
+        if not key in self.pending:
+            self.pending[key] = self.pool.submit(self.run, key)
+        return None
+
+    def run(self, key):
+        try:
+            data = make_thumbnail(key[0], self.cache_dir, self.size, 4, 1)
+        except Exception:
+            data = None
+        self.results.put((key, data))
+
+    def cancel_except(self, keep):
+        # drop queued renders that scrolled out of view, running ones finish and are cached on disk
+        for key in list(self.pending.keys()):
+            if not key in keep and self.pending[key].cancel():
+                del self.pending[key]
+
+    def poll(self,):
+        """
+        Moves finished thumbnails into memory.
+
+        Returns:
+            list: paths that got a thumbnail since the last poll.
+        """
+        done = []
+        while True:
+            try:
+                key, data = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending.pop(key, None)
+            self.images[key] = self.to_image(data) if data != None else False
+            self.images.move_to_end(key)
+            while len(self.images) > self.max_images:
+                self.images.popitem(last=False)
+            done.append(key[0])
+        return done
+
+    def close(self,):
+        self.cancel_except({})
+        self.pool.shutdown(wait=False)
@@ -9,80 +9,134 @@ VOXELS = 0
 EDGES = 1
 SELECT = 2
 
+BRUSH = 0
+RECTANGLE = 1
+FLOOD = 2
+STAMP = 3
+
+EDGE_H = 0
+EDGE_V = 1
+
+SYMMETRY_NONE = 0
+SYMMETRY_X = 1
+SYMMETRY_Y = 2
+SYMMETRY_XY = 3
+
+DIFF_NONE = 0
+DIFF_ADDED = 1
+DIFF_REMOVED = 2
+DIFF_RETYPED = 3
+
 ARROW_CURSOR = 0
 HAND_CURSOR = 1
 
 import random
 import numpy as np
+import chunked_grid
 import time
-from typing import Tuple, Optional
+from collections import deque
 
-class Timer():
+class FrameScheduler():
     """
-    Helpful timer class to set a target step/render frequency. Used for visualizations.
+    Paces the editor loop without busy waiting. Each named cadence (input, render, ...) has its own rate, the
+    loop sleeps until the earliest one is due and then asks which cadences should run this iteration.
 
     Args:
-        target_step_frequency (int): target frequency (in steps per second). If `None`, always steps. (default = None)
+        rates (dict): cadence name to target frequency (in steps per second).
+        stats_window (int): number of recent frame times kept for statistics. (default = 120)
     """
-    def __init__(self, target_step_frequency: Optional[int] = None) -> None:
-        self._target_rps = target_step_frequency if target_step_frequency is not None else float('inf')
-        self._total_steps = 0
-        self.total_count = 0
-        self._steps = 0
-        self._old_time = self._current_time()
-
-    def _current_time(self) -> int:
+    def __init__(self, rates: dict, stats_window: int = 120) -> None:
+        now = time.perf_counter()
+        self._intervals = {}
+        self._next_due = {}
+        for name, rate in rates.items():
+            self._intervals[name] = 1.0/rate
+            self._next_due[name] = now
+        self._frame_times = deque(maxlen=stats_window)
+        self._last_frame = None
+
+    def set_rate(self, name: str, rate: float) -> None:
+        """
+        Change the target frequency of a cadence, adding it if it doesn't exist yet.
+
+        Args:
+            name (str): cadence name.
+            rate (float): target frequency (in steps per second).
         """
-        Get the current time in ms.
+        self._intervals[name] = 1.0/rate
+        self._next_due[name] = time.perf_counter()
+
+    def get_delay(self) -> float:
+        """
+        Time left until the next cadence is due, for loops driven by another event loop's timers.
 
         Returns:
-            int: current time.
+            float: delay in seconds, 0 if a cadence is already due.
         """
-        return int(round(time.time() * 1000))
+        return max(0.0, min(self._next_due.values()) - time.perf_counter())
 
-    def should_step(self) -> bool:
+    def due(self, name: str) -> bool:
         """
-        Returns whether or not to step at the current time to maintin the target step frequency.
+        Returns whether the cadence should run now and, if so, schedules its next step. A cadence that fell more
+        than one step behind is resynchronized instead of running several times back to back.
+
+        Args:
+            name (str): cadence name.
 
         Returns:
-            bool: whether or not to step (True = should step).
+            bool: whether or not to run the cadence (True = should run).
         """
-        if self._steps >= (self._target_rps-1)*(self._current_time() - self._old_time)/1000:
+        now = time.perf_counter()
+        if now < self._next_due[name]:
             return False
+        self._next_due[name] += self._intervals[name]
+        if self._next_due[name] < now:
+            self._next_due[name] = now + self._intervals[name]
         return True
 
-    def step(self, verbose=False):
+    def frame_done(self) -> None:
+        """
+        Record the end of a rendered frame for the frame time statistics.
         """
-        Step the timer.
+        now = time.perf_counter()
+        if self._last_frame != None:
+            self._frame_times.append(now - self._last_frame)
+        self._last_frame = now
 
-        Args:
-            verbose (bool): whether or not to print out the current step frequency and the average step frequency since starting the timer. (default = False)
+    def get_stats(self) -> dict:
+        """
+        Frame time statistics over the recent window.
+
+        Returns:
+            dict: `fps`, `mean_ms`, `p95_ms` and `max_ms`, all 0 before two frames were rendered.
         """
-        self._steps += 1
-        if self._current_time() - self._old_time > 1000:
-            self._total_steps += self._steps
-            self.total_count += 1
-            self._old_time += 1000
-            if verbose:
-                print(f'rps: {self._steps} | avg rps: {round(self._total_steps/self.total_count*100.0)/100.0}')
-            self._steps = 0
+        if len(self._frame_times) == 0:
+            return {'fps': 0.0, 'mean_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        times = np.array(self._frame_times)*1000
+        mean = float(times.mean())
+        return {
+            'fps': 1000/mean if mean > 0 else 0.0,
+            'mean_ms': mean,
+            'p95_ms': float(np.percentile(times, 95)),
+            'max_ms': float(times.max())}
 
 class Node:
     def __init__(self, type):
         self.type = type
         self.neighbors = {}
         self.id = None
-        self.old_id = None
 
 class Object:
     def __init__(self):
         self.name = None
         self.nodes = {}
+        self.version = None
 
     def copy(self,):
         obj = Object()
         obj.name = self.name
         obj.nodes = self.nodes.copy()
+        obj.version = self.version
         return obj
 
 def flip_y(idx, width, height):
@@ -91,33 +145,66 @@ def flip_y(idx, width, height):
     return y*width + x
 
 def make_blank_grid(width, height):
-    grid = []
-    for i in range(height):
-        grid.append([])
-        for j in range(width):
-            grid[-1].append(Node(0))
-            # if (i-3)^2 + (j-3)^2 > 5:
-            #     grid[-1].append(Node(0))
-            # else:
-            #     grid[-1].append(Node(random.randint(1, 5)))
-    return grid
+    return chunked_grid.ChunkedGrid(width, height)
 
 def set_ids(grid):
-    count = 0
-    for row in grid:
-        for node in row:
-            node.id = count
-            count += 1
-
-def set_old_ids(grid):
-    for row in grid:
-        for node in row:
-            node.old_id = node.id
-
-def pair_to_string(a, b):
-    if a < b:
-        return f'{a} {b}'
-    return f'{b} {a}'
+    return grid.set_ids()
+
+def get_types(grid):
+    types = np.zeros((len(grid), len(grid[0])), dtype=np.uint8)
+    for x, y, node in grid.items():
+        types[y][x] = node.type
+    return types
+
+def get_connections(grid):
+    grid_height = len(grid)
+    grid_width = len(grid[0])
+
+    # conn_h[y, x] links (x, y) to (x+1, y), conn_v[y, x] links (x, y) to (x, y+1)
+    conn_h = np.zeros((grid_height, grid_width-1), dtype=bool)
+    conn_v = np.zeros((grid_height-1, grid_width), dtype=bool)
+    for j, i, node in grid.items():
+        if node.type == CELL_EMPTY:
+            continue
+        for nei in node.neighbors:
+            if nei == node.id + 1 and j < grid_width-1:
+                conn_h[i][j] = True
+            if nei == node.id + grid_width:
+                conn_v[i][j] = True
+    return conn_h, conn_v
+
+def pair_to_edge(a, b, grid_width):
+    # edges are numbered 2*cell + orientation, where cell is the top left of the pair
+    lo, hi = min(a, b), max(a, b)
+    if hi == lo + grid_width:
+        return 2*lo + EDGE_V
+    return 2*lo + EDGE_H
+
+def edge_to_pair(edge, grid_width):
+    cell = edge//2
+    if edge%2 == EDGE_V:
+        return cell, cell + grid_width
+    return cell, cell + 1
+
+def get_line(x0, y0, x1, y1):
+    # Bresenham's line, with diagonal steps split in two so the cells stay 4-connected
+    cells = [(x0, y0)]
+    dx, dy = abs(x1-x0), -abs(y1-y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
+    while x0 != x1 or y0 != y1:
+        e2 = 2*err
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+            if e2 <= dx:
+                cells.append((x0, y0))
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+        cells.append((x0, y0))
+    return cells
 
 def make_thicker(lx, ly, hx, hy, factor):
     if abs(lx - hx) < abs(ly - hy):
@@ -134,7 +221,7 @@ def get_node_by_index(grid, index):
     grid_height = len(grid)
     grid_width = len(grid[0])
     x, y = index%grid_width, index//grid_width
-    node = grid[y][x]
+    node = grid.node_at(x, y)
     assert node.id == index, 'Index mismatch, something has gone terribly wrong.'
     return node
 
@@ -144,7 +231,7 @@ def get_left(grid, index):
     x, y = index%grid_width, index//grid_width
     x -= 1
     if is_valid(grid, x, y):
-        return grid[y][x]
+        return grid.node_at(x, y)
     return None
 
 def get_right(grid, index):
@@ -153,7 +240,7 @@ def get_right(grid, index):
     x, y = index%grid_width, index//grid_width
     x += 1
     if is_valid(grid, x, y):
-        return grid[y][x]
+        return grid.node_at(x, y)
     return None    
 
 def get_up(grid, index):
@@ -162,7 +249,7 @@ def get_up(grid, index):
     x, y = index%grid_width, index//grid_width
     y -= 1
     if is_valid(grid, x, y):
-        return grid[y][x]
+        return grid.node_at(x, y)
     return None    
 
 def get_down(grid, index):
@@ -171,7 +258,7 @@ def get_down(grid, index):
     x, y = index%grid_width, index//grid_width
     y += 1
     if is_valid(grid, x, y):
-        return grid[y][x]
+        return grid.node_at(x, y)
     return None
 
 def is_valid(grid, x, y):
@@ -184,53 +271,36 @@ def is_valid(grid, x, y):
     return True
 
 def get_objects(grid):
-    grid_height = len(grid)
-    grid_width = len(grid[0])
-    objects_grid = []
     discovered = {}
-    
-    for i in range(grid_height):
-        objects_grid.append([])
-        for j in range(grid_width):
-            objects_grid[-1].append(-1)
 
     object_count = 0
-    for i in range(grid_height):
-        for j in range(grid_width):
-            node = grid[i][j]
-            if node.type == CELL_EMPTY or node.id in discovered:
-                continue
-            flood_fill_explore(node.id, grid, objects_grid, discovered, object_count)
-            object_count += 1
-    
-    objects = {}
-    for i in range(grid_height):
-        for j in range(grid_width):
-            object_id = objects_grid[i][j]
-            if object_id == -1:
-                continue
-            if not object_id in objects:
-                objects[object_id] = Object()
-            objects[object_id].nodes[grid[i][j].id] = True
-    return objects
-
-def flood_fill_explore(index, grid, objects_grid, discovered, object_count):
-    
-    grid_height = len(grid)
-    grid_width = len(grid[0])
-    x, y = index%grid_width, index//grid_width
-
-    discovered[index] = True
-    objects_grid[y][x] = object_count
-
-    nodes = [get_left(grid, index), get_right(grid, index), get_up(grid, index), get_down(grid, index)]
-    for node in nodes:
-        if node == None or node.type == CELL_EMPTY or node.id in discovered:
-            continue
-        if not index in node.neighbors:
+    for node in sorted([node for x, y, node in grid.items()], key=lambda node: node.id):
+        if node.type == CELL_EMPTY or node.id in discovered:
             continue
-        flood_fill_explore(node.id, grid, objects_grid, discovered, object_count)
+        flood_fill_explore(node.id, grid, discovered, object_count)
+        object_count += 1
 
+    # row-major node order, as the dense scan used to produce
+    objects = {}
+    for node_id in sorted(discovered):
+        object_id = discovered[node_id]
+        if not object_id in objects:
+            objects[object_id] = Object()
+        objects[object_id].nodes[node_id] = True
+    return objects
 
-    
+def flood_fill_explore(index, grid, discovered, object_count):
 
+    # iterative so large objects do not hit the recursion limit
+    discovered[index] = object_count
+    frontier = [index]
+    while len(frontier) > 0:
+        curr = frontier.pop()
+        nodes = [get_left(grid, curr), get_right(grid, curr), get_up(grid, curr), get_down(grid, curr)]
+        for node in nodes:
+            if node == None or node.type == CELL_EMPTY or node.id in discovered:
+                continue
+            if not curr in node.neighbors:
+                continue
+            discovered[node.id] = object_count
+            frontier.append(node.id)
@@ -18,17 +18,19 @@ from OpenGL.GL import *
 from OpenGL.GLU import *
 from OpenGL.GLUT import *
 
+import math
+import numpy as np
+
 import colors
 import utils
-
-from utils import Timer
+import connectivity
 
 class Viewer:
 
     has_init_glfw = False
     window_count = 1
 
-    def __init__(self, window_name=None):
+    def __init__(self, window_name=None, swap_interval=1):
 
         if (not Viewer.has_init_glfw):
             if not glfw.init():
@@ -66,6 +68,10 @@ class Viewer:
             glfw.terminate()
             raise RuntimeError(f'Could not create glfw window: {self.window_name}.')
 
+        # let swap_buffers wait for vblank instead of presenting as fast as the loop runs
+        glfw.make_context_current(self.window)
+        glfw.swap_interval(swap_interval)
+
         self.box_thickness = 1.0
         self.border_thickness = 0.05
 
@@ -83,9 +89,14 @@ class Viewer:
         self.currently_selected = None
         self.mouse_press = False
         self.mouse_held = False
+        self.mouse_release = False
         self.right_mouse_press = False
         self.right_mouse_held = False
 
+        # cells crossed by the cursor since the last frame while the left button is held
+        self.stroke = []
+        self.stroke_cell = None
+
         self.grab_x, self.grab_y = None, None
         self.init_cam_pos_x, self.init_cam_pos_y = None, None
 
@@ -95,15 +106,34 @@ class Viewer:
         self.hand_cursor = glfw.create_standard_cursor(glfw.HAND_CURSOR)
         self.cursor_mode = utils.ARROW_CURSOR
 
-        self.timer = Timer(30)
+        # below this zoom the grid is drawn as one texel per voxel
+        self.lod_zoom_threshold = 10.0
+        self.lod_texture = None
+        self.lod_size = None
+        self.lod_dirty = True
+        self.lod_pending = {}
+        self.outline_cache = {}
+        self.cut_point_cache = {}
+        self.diff = None
+
+        # overview of the whole grid in the bottom right corner, drawn from the LOD texture
+        self.minimap_size = 200
+        self.minimap_margin = 10
+        self.minimap_held = False
+        self.lod_palette = np.array([[round(c*255) for c in color] for color in colors.VOXEL_COLORS], dtype=np.uint8)
 
     def load(self, file_name):
         self.currently_hovered = None
         self.currently_selected = None
+        self.lod_dirty = True
     
+    def show_frame_stats(self, stats):
+        glfw.set_window_title(self.window, f'{self.window_name} | {stats["fps"]:.0f} fps, {stats["mean_ms"]:.1f} ms mean, {stats["p95_ms"]:.1f} ms p95')
+
     def change_gs(self, new_width, new_height):
         self.currently_hovered = None
         self.currently_selected = None
+        self.lod_dirty = True
 
         height_diff = new_height - self.grid_height
         self.cam_pos_y += height_diff*(self.border_thickness + self.box_thickness)
@@ -156,8 +186,9 @@ class Viewer:
         grid_height = len(grid)
         grid_width = len(grid[0])
 
-        for i in range(grid_height):
-            for j in range(grid_width):
+        min_x, max_x, min_y, max_y = self.get_visible_range(grid_width, grid_height)
+        for i in range(min_y, max_y):
+            for j in range(min_x, max_x):
                 y = i
                 x = j
 
@@ -184,54 +215,78 @@ class Viewer:
         grid_height = len(grid)
         grid_width = len(grid[0])
 
-        for i in range(grid_height):
-            for j in range(grid_width):
-                y = i
-                x = j
+        min_x, max_x, min_y, max_y = self.get_visible_range(grid_width, grid_height)
+        for j, i, node in grid.items_in(min_x, max_x, min_y, max_y):
+            y = i
+            x = j
 
-                if grid[i][j].type == utils.CELL_EMPTY:
-                    continue
+            if node.type == utils.CELL_EMPTY:
+                continue
+
+            for direction in ['l', 'r', 'u', 'd']:
+                
+                if direction == 'l':
+                    other = utils.get_left(grid, node.id)
+                    if other == None or other.type == utils.CELL_EMPTY:
+                        continue
+                    lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
+                    hx, hy = (lx+self.border_thickness, ly+self.box_thickness+self.border_thickness*2)
+
+                if direction == 'r':
+                    other = utils.get_right(grid, node.id)
+                    if other == None or other.type == utils.CELL_EMPTY:
+                        continue
+                    lx, ly = ((x+1)*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
+                    hx, hy = (lx+self.border_thickness, ly+self.box_thickness+self.border_thickness*2)
 
-                for direction in ['l', 'r', 'u', 'd']:
-                    
-                    if direction == 'l':
-                        other = utils.get_left(grid, grid[i][j].id)
-                        if other == None or other.type == utils.CELL_EMPTY:
-                            continue
-                        lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
-                        hx, hy = (lx+self.border_thickness, ly+self.box_thickness+self.border_thickness*2)
-
-                    if direction == 'r':
-                        other = utils.get_right(grid, grid[i][j].id)
-                        if other == None or other.type == utils.CELL_EMPTY:
-                            continue
-                        lx, ly = ((x+1)*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
-                        hx, hy = (lx+self.border_thickness, ly+self.box_thickness+self.border_thickness*2)
-
-                    if direction == 'u':
-                        other = utils.get_up(grid, grid[i][j].id)
-                        if other == None or other.type == utils.CELL_EMPTY:
-                            continue
-                        lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
-                        hx, hy = (lx+self.box_thickness+self.border_thickness*2, ly+self.border_thickness)
-
-                    if direction == 'd':
-                        other = utils.get_down(grid, grid[i][j].id)
-                        if other == None or other.type == utils.CELL_EMPTY:
-                            continue
-                        lx, ly = (x*(self.border_thickness + self.box_thickness), (y+1)*(self.border_thickness + self.box_thickness))
-                        hx, hy = (lx+self.box_thickness+self.border_thickness*2, ly+self.border_thickness)
-
-                    lx, ly, hx, hy = utils.make_thicker(lx, ly, hx, hy, 5)
-                    lx, ly = self.to_camera(lx, ly)
-                    hx, hy = self.to_camera(hx, hy)
-
-                    if mx > lx and mx < hx:
-                        if my < ly and my > hy:
-                            return utils.pair_to_string(grid[i][j].id, other.id)
+                if direction == 'u':
+                    other = utils.get_up(grid, node.id)
+                    if other == None or other.type == utils.CELL_EMPTY:
+                        continue
+                    lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
+                    hx, hy = (lx+self.box_thickness+self.border_thickness*2, ly+self.border_thickness)
+
+                if direction == 'd':
+                    other = utils.get_down(grid, node.id)
+                    if other == None or other.type == utils.CELL_EMPTY:
+                        continue
+                    lx, ly = (x*(self.border_thickness + self.box_thickness), (y+1)*(self.border_thickness + self.box_thickness))
+                    hx, hy = (lx+self.box_thickness+self.border_thickness*2, ly+self.border_thickness)
+
+                lx, ly, hx, hy = utils.make_thicker(lx, ly, hx, hy, 5)
+                lx, ly = self.to_camera(lx, ly)
+                hx, hy = self.to_camera(hx, hy)
+
+                if mx > lx and mx < hx:
+                    if my < ly and my > hy:
+                        return utils.pair_to_edge(node.id, other.id, grid_width)
             
         return None
 
+    def mouse_to_cell(self,):
+        mx, my = self.get_mouse_pos()
+        pitch = self.border_thickness + self.box_thickness
+        x = (mx - self.res_width/2)/self.zoom + self.cam_pos_x
+        y = (my - self.res_height/2)/self.zoom + self.cam_pos_y
+        return int(math.floor(x/pitch)), int(math.floor(y/pitch))
+
+    def update_stroke(self,):
+        self.stroke = []
+        if not self.mouse_held:
+            self.stroke_cell = None
+            return
+
+        cell = self.mouse_to_cell()
+        if self.stroke_cell == None:
+            path = [cell]
+        else:
+            path = utils.get_line(*self.stroke_cell, *cell)[1:]
+        self.stroke_cell = cell
+
+        for x, y in path:
+            if x >= 0 and x < self.grid_width and y >= 0 and y < self.grid_height:
+                self.stroke.append(y*self.grid_width + x)
+
     def on_scroll(self, a, b, c):
         self.scroll += c * 0.75
 
@@ -255,16 +310,41 @@ class Viewer:
     def update_hover(self, grid):
         self.currently_hovered = None
 
+        if self.mouse_on_minimap():
+            return
+
         node, node_id = self.mouse_to_node(grid)
         if node != None:
             self.currently_hovered = ('node', node, node_id, node.type)
 
-        pair = self.mouse_to_edge(grid)
-        if pair != None:
-            self.currently_hovered = ('edge', pair)
+        edge = self.mouse_to_edge(grid)
+        if edge != None:
+            self.currently_hovered = ('edge', edge)
 
         #print(self.currently_hovered)
 
+    def select_object(self, grid, objects, object_id):
+        node_id = min(objects[object_id].nodes)
+        node = utils.get_node_by_index(grid, node_id)
+        self.currently_selected = ('node', node, node_id, node.type)
+
+        # bring the object into view
+        grid_width = len(grid[0])
+        pitch = self.border_thickness + self.box_thickness
+        self.cam_pos_x = (node_id%grid_width + 0.5)*pitch + self.border_thickness
+        self.cam_pos_y = (node_id//grid_width + 0.5)*pitch + self.border_thickness
+
+    def set_camera(self, x=None, y=None, zoom=None):
+        # x and y are cell coordinates of the view center, None keeps the current value
+        if zoom != None:
+            self.zoom = max(5, zoom)
+            self.border_thickness = 0.02 + 2/self.zoom
+        pitch = self.border_thickness + self.box_thickness
+        if x != None:
+            self.cam_pos_x = (x + 0.5)*pitch + self.border_thickness
+        if y != None:
+            self.cam_pos_y = (y + 0.5)*pitch + self.border_thickness
+
     def update_selected(self, grid, node_to_object, just_altered):
         if self.mouse_press:
             if self.currently_selected != self.currently_hovered:
@@ -274,18 +354,14 @@ class Viewer:
                 if hovered != None and hovered[0] == 'node' and utils.get_node_by_index(grid, hovered[2]).type != utils.CELL_EMPTY:
                     hovered_object = node_to_object[hovered[2]]
                 if hovered != None and hovered[0] == 'edge':
-                    a, b = tuple(hovered[1].split())
-                    a, b = int(a), int(b)
-                    hovered_object = node_to_object[a]
+                    hovered_object = node_to_object[hovered[1]//2]
 
                 selected_object = None
                 selected = self.currently_selected
                 if selected != None and selected[0] == 'node' and utils.get_node_by_index(grid, selected[2]).type != utils.CELL_EMPTY:
                     selected_object = node_to_object[selected[2]]
                 if selected != None and selected[0] == 'edge':
-                    a, b = tuple(selected[1].split())
-                    a, b = int(a), int(b)
-                    selected = node_to_object[a]
+                    selected_object = node_to_object[selected[1]//2]
 
                 if hovered_object != None and selected_object != hovered_object:
                     self.currently_selected = self.currently_hovered
@@ -300,14 +376,20 @@ class Viewer:
     def update_mouse_press(self,):
 
         if self.get_mouse_press():
-            if self.mouse_held == True:
+            if self.mouse_held == True or self.minimap_held == True:
                 self.mouse_press = False
+            elif self.mouse_on_minimap():
+                # clicks on the minimap move the camera and never reach the grid
+                self.minimap_held = True
             else:
                 self.mouse_press = True
                 self.mouse_held = True
+            self.mouse_release = False
         else:
+            self.mouse_release = self.mouse_held
             self.mouse_held = False
             self.mouse_press = False
+            self.minimap_held = False
     
     def update_right_mouse_press(self,):
 
@@ -328,22 +410,31 @@ class Viewer:
         if self.cursor_mode == utils.HAND_CURSOR:
             glfw.set_cursor(self.window, self.hand_cursor)
 
-    def render(self, grid, objects, hovered_object_id, selected_object_id, mode):
+    def render(self, grid, objects, node_to_object, hovered_object_id, selected_object_id, region, mode, symmetry_axes=(None, None)):
         
         glfw.make_context_current(self.window)
         glViewport(0, 0, self.res_width, self.res_height)
         self.reset()
 
-        self.render_grid(grid, mode==utils.VOXELS)
-        self.render_voxels(grid, mode==utils.VOXELS)
-        self.render_edges(grid, objects, hovered_object_id, selected_object_id)
-        if mode == utils.EDGES:
-            self.render_selected_edges(grid)
+        if self.zoom < self.lod_zoom_threshold:
+            self.render_lod(grid)
+        else:
+            self.render_grid(grid, mode==utils.VOXELS)
+            self.render_voxels(grid, mode==utils.VOXELS)
+            self.render_edges(grid, objects, hovered_object_id, selected_object_id)
+            if mode == utils.EDGES:
+                self.render_selected_edges(grid, objects, node_to_object)
+        self.render_diff(grid)
+        if region != None:
+            self.render_region(region)
+        self.render_symmetry(symmetry_axes)
+        self.render_minimap(grid)
 
         glfw.swap_buffers(self.window)
-        glfw.poll_events()
 
-    def update_and_render(self, grid, objects, node_to_object, hovered_object_id, selected_object_id, just_altered, mode):
+    def update_input(self, grid, node_to_object, just_altered, altered_nodes):
+
+        glfw.poll_events()
 
         self.cursor_mode = utils.ARROW_CURSOR
         self.grid_width, self.grid_height = len(grid[0]), len(grid)
@@ -353,12 +444,13 @@ class Viewer:
         self.update_camera_pos()
         self.update_hover(grid)
         self.update_mouse_press()
+        self.update_minimap_camera()
+        self.update_stroke()
         self.update_selected(grid, node_to_object, just_altered)
         self.update_cursor()
 
-        if self.timer.should_step():
-            self.render(grid, objects, hovered_object_id, selected_object_id, mode)
-            self.timer.step()
+        # input runs more often than rendering, so keep edits until the next frame uploads them
+        self.lod_pending.update(altered_nodes)
 
     def reset(self,):
         glClearColor(*colors.CLEAR_COLOR)
@@ -369,176 +461,194 @@ class Viewer:
         grid_height = len(grid)
         grid_width = len(grid[0])
 
-        for i in range(grid_height):
-            for j in range(grid_width):
-                y = i 
-                x = j
+        glColor3f(*colors.EDGE_FULL)
 
-                if grid[i][j].type == utils.CELL_EMPTY:
-                    continue
-
-                hovered = hovered_object_id != None and grid[i][j].id in objects[hovered_object_id].nodes 
-                hovered = hovered or (selected_object_id != None and grid[i][j].id in objects[selected_object_id].nodes)
-
-                for direction in ['l', 'r', 'u', 'd']:
-
-                    if direction == 'l':
-                        other = utils.get_left(grid, grid[i][j].id)
-                        if other != None and other.type != utils.CELL_EMPTY and grid[i][j].id in other.neighbors:
-                            continue
-                        lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
-                        hx, hy = (lx+self.border_thickness, ly+self.box_thickness+self.border_thickness*2)
-
-                    if direction == 'r':
-                        other = utils.get_right(grid, grid[i][j].id)
-                        if other != None and other.type != utils.CELL_EMPTY and grid[i][j].id in other.neighbors:
-                            continue
-                        lx, ly = ((x+1)*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
-                        hx, hy = (lx+self.border_thickness, ly+self.box_thickness+self.border_thickness*2)
-
-                    if direction == 'u':
-                        other = utils.get_up(grid, grid[i][j].id)
-                        if other != None and other.type != utils.CELL_EMPTY and grid[i][j].id in other.neighbors:
-                            continue
-                        lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
-                        hx, hy = (lx+self.box_thickness+self.border_thickness*2, ly+self.border_thickness)
-
-                    if direction == 'd':
-                        other = utils.get_down(grid, grid[i][j].id)
-                        if other != None and other.type != utils.CELL_EMPTY and grid[i][j].id in other.neighbors:
-                            continue
-                        lx, ly = (x*(self.border_thickness + self.box_thickness), (y+1)*(self.border_thickness + self.box_thickness))
-                        hx, hy = (lx+self.box_thickness+self.border_thickness*2, ly+self.border_thickness)
-
-
-                    dim_factor = 1.15
-                    dim_additive = 0.07
-                    voxel_color = colors.EDGE_FULL
-                    if hovered:
-                        voxel_color = colors.EDGE_SELECTED
-                        voxel_color = (voxel_color[0]*dim_factor+dim_additive, voxel_color[1]*dim_factor+dim_additive, voxel_color[2]*dim_factor+dim_additive)
-
-                    glColor3f(*voxel_color)
-                    
-                    self.render_voxel(*self.to_camera(lx, ly), *self.to_camera(hx, hy))
+        min_x, max_x, min_y, max_y = self.get_visible_range(grid_width, grid_height)
+        for j, i, node in grid.items_in(min_x, max_x, min_y, max_y):
+            y = i 
+            x = j
 
-        repeat_nodes = []
-        if hovered_object_id != None:
-            for node in objects[hovered_object_id].nodes:
-                repeat_nodes.append(node)
-        if selected_object_id != None:
-            for node in objects[selected_object_id].nodes:
-                repeat_nodes.append(node)
-
-        for index in repeat_nodes:
-            x, y = index%grid_width, index//grid_width
-            i, j = y, x 
-
-            if grid[i][j].type == utils.CELL_EMPTY:
-                    continue
-
-            hovered = hovered_object_id != None and grid[i][j].id in objects[hovered_object_id].nodes 
-            hovered = hovered or (selected_object_id != None and grid[i][j].id in objects[selected_object_id].nodes)
+            if node.type == utils.CELL_EMPTY:
+                continue
 
             for direction in ['l', 'r', 'u', 'd']:
 
                 if direction == 'l':
-                    other = utils.get_left(grid, grid[i][j].id)
-                    if other != None and other.type != utils.CELL_EMPTY and grid[i][j].id in other.neighbors:
+                    other = utils.get_left(grid, node.id)
+                    if other != None and other.type != utils.CELL_EMPTY and node.id in other.neighbors:
                         continue
                     lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
                     hx, hy = (lx+self.border_thickness, ly+self.box_thickness+self.border_thickness*2)
 
                 if direction == 'r':
-                    other = utils.get_right(grid, grid[i][j].id)
-                    if other != None and other.type != utils.CELL_EMPTY and grid[i][j].id in other.neighbors:
+                    other = utils.get_right(grid, node.id)
+                    if other != None and other.type != utils.CELL_EMPTY and node.id in other.neighbors:
                         continue
                     lx, ly = ((x+1)*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
                     hx, hy = (lx+self.border_thickness, ly+self.box_thickness+self.border_thickness*2)
 
                 if direction == 'u':
-                    other = utils.get_up(grid, grid[i][j].id)
-                    if other != None and other.type != utils.CELL_EMPTY and grid[i][j].id in other.neighbors:
+                    other = utils.get_up(grid, node.id)
+                    if other != None and other.type != utils.CELL_EMPTY and node.id in other.neighbors:
                         continue
                     lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
                     hx, hy = (lx+self.box_thickness+self.border_thickness*2, ly+self.border_thickness)
 
                 if direction == 'd':
-                    other = utils.get_down(grid, grid[i][j].id)
-                    if other != None and other.type != utils.CELL_EMPTY and grid[i][j].id in other.neighbors:
+                    other = utils.get_down(grid, node.id)
+                    if other != None and other.type != utils.CELL_EMPTY and node.id in other.neighbors:
                         continue
                     lx, ly = (x*(self.border_thickness + self.box_thickness), (y+1)*(self.border_thickness + self.box_thickness))
                     hx, hy = (lx+self.box_thickness+self.border_thickness*2, ly+self.border_thickness)
 
+                self.render_voxel(*self.to_camera(lx, ly), *self.to_camera(hx, hy))
 
-                dim_factor = 1.15
-                dim_additive = 0.07
-                voxel_color = colors.EDGE_FULL
-                if hovered:
-                    voxel_color = colors.EDGE_SELECTED
-                    voxel_color = (voxel_color[0]*dim_factor+dim_additive, voxel_color[1]*dim_factor+dim_additive, voxel_color[2]*dim_factor+dim_additive)
+        # highlighted objects are drawn on top from their cached outlines
+        dim_factor = 1.15
+        dim_additive = 0.07
+        voxel_color = colors.EDGE_SELECTED
+        voxel_color = (voxel_color[0]*dim_factor+dim_additive, voxel_color[1]*dim_factor+dim_additive, voxel_color[2]*dim_factor+dim_additive)
+        glColor3f(*voxel_color)
 
-                glColor3f(*voxel_color)
-                
-                self.render_voxel(*self.to_camera(lx, ly), *self.to_camera(hx, hy))
+        for object_id in [hovered_object_id, selected_object_id]:
+            if object_id == None:
+                continue
+            sides = self.get_outline(grid, objects[object_id])
+            self.render_outline(sides)
+
+        # drop outlines of objects that no longer exist
+        if len(self.outline_cache) > 2*len(objects):
+            live_versions = {obj.version: True for obj in objects.values()}
+            self.outline_cache = {version: sides for version, sides in self.outline_cache.items() if version in live_versions}
+
+    def get_outline(self, grid, obj):
+
+        if obj.version in self.outline_cache:
+            return self.outline_cache[obj.version]
+
+        grid_width = len(grid[0])
+
+        # one (x, y, direction) row per unconnected side, directions ordered left, right, up, down
+        sides = []
+        for index in obj.nodes:
+            x, y = index%grid_width, index//grid_width
+            others = [utils.get_left(grid, index), utils.get_right(grid, index), utils.get_up(grid, index), utils.get_down(grid, index)]
+            for direction, other in enumerate(others):
+                if other != None and other.type != utils.CELL_EMPTY and index in other.neighbors:
+                    continue
+                sides.append((x, y, direction))
+
+        sides = np.array(sides, dtype=np.float32).reshape(-1, 3)
+        self.outline_cache[obj.version] = sides
+        return sides
 
-    def render_selected_edges(self, grid):
+    def render_outline(self, sides):
+
+        if len(sides) == 0:
+            return
+
+        pitch = self.border_thickness + self.box_thickness
+        x, y, direction = sides[:, 0], sides[:, 1], sides[:, 2]
+        vertical = direction < 2
+
+        lx = (x + (direction == 1))*pitch
+        ly = (y + (direction == 3))*pitch
+        hx = lx + np.where(vertical, self.border_thickness, self.box_thickness + self.border_thickness*2)
+        hy = ly + np.where(vertical, self.box_thickness + self.border_thickness*2, self.border_thickness)
+
+        lx, ly = self.to_camera(lx, ly)
+        hx, hy = self.to_camera(hx, hy)
+
+        # same winding as render_voxel
+        vertices = np.stack([lx, ly, lx, hy, hx, hy, hx, ly], axis=1).astype(np.float32)
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 0, vertices)
+        glDrawArrays(GL_QUADS, 0, len(sides)*4)
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+    def get_cut_points(self, grid, obj):
+
+        if not obj.version in self.cut_point_cache:
+            self.cut_point_cache[obj.version] = connectivity.find_cut_points(grid, obj.nodes)
+        return self.cut_point_cache[obj.version]
+
+    def render_selected_edges(self, grid, objects, node_to_object):
         
         grid_height = len(grid)
         grid_width = len(grid[0])
 
-        for i in range(grid_height):
-            for j in range(grid_width):
-                y = i 
-                x = j
+        # drop results of objects that no longer exist
+        if len(self.cut_point_cache) > 2*len(objects):
+            live_versions = {obj.version: True for obj in objects.values()}
+            self.cut_point_cache = {version: cut for version, cut in self.cut_point_cache.items() if version in live_versions}
+
+        min_x, max_x, min_y, max_y = self.get_visible_range(grid_width, grid_height)
+        for j, i, node in grid.items_in(min_x, max_x, min_y, max_y):
+            y = i 
+            x = j
+
+            if node.type == utils.CELL_EMPTY:
+                continue
+
+            # connections that would split the object if removed, and voxels holding it together
+            bridges, articulation = self.get_cut_points(grid, objects[node_to_object[node.id]])
+            if node.id in articulation:
+                glColor3f(*colors.CUT_VOXEL)
+                lx = x*(self.border_thickness + self.box_thickness) + self.border_thickness + self.box_thickness*0.4
+                ly = y*(self.border_thickness + self.box_thickness) + self.border_thickness + self.box_thickness*0.4
+                hx, hy = lx + self.box_thickness*0.2, ly + self.box_thickness*0.2
+                self.render_voxel(*self.to_camera(lx, ly), *self.to_camera(hx, hy))
 
-                if grid[i][j].type == utils.CELL_EMPTY:
-                    continue
+            for direction in ['l', 'r', 'u', 'd']:
+                
+                if direction == 'l':
+                    other = utils.get_left(grid, node.id)
+                    if other == None or other.type == utils.CELL_EMPTY:
+                        continue
+                    lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
+                    hx, hy = (lx+self.border_thickness, ly+self.box_thickness+self.border_thickness*2)
 
-                for direction in ['l', 'r', 'u', 'd']:
-                    
-                    if direction == 'l':
-                        other = utils.get_left(grid, grid[i][j].id)
-                        if other == None or other.type == utils.CELL_EMPTY:
-                            continue
-                        lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
-                        hx, hy = (lx+self.border_thickness, ly+self.box_thickness+self.border_thickness*2)
-
-                    if direction == 'r':
-                        other = utils.get_right(grid, grid[i][j].id)
-                        if other == None or other.type == utils.CELL_EMPTY:
-                            continue
-                        lx, ly = ((x+1)*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
-                        hx, hy = (lx+self.border_thickness, ly+self.box_thickness+self.border_thickness*2)
-
-                    if direction == 'u':
-                        other = utils.get_up(grid, grid[i][j].id)
-                        if other == None or other.type == utils.CELL_EMPTY:
-                            continue
-                        lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
-                        hx, hy = (lx+self.box_thickness+self.border_thickness*2, ly+self.border_thickness)
-
-                    if direction == 'd':
-                        other = utils.get_down(grid, grid[i][j].id)
-                        if other == None or other.type == utils.CELL_EMPTY:
-                            continue
-                        lx, ly = (x*(self.border_thickness + self.box_thickness), (y+1)*(self.border_thickness + self.box_thickness))
-                        hx, hy = (lx+self.box_thickness+self.border_thickness*2, ly+self.border_thickness)
-
-                    if not grid[i][j].id in other.neighbors:
-                        edge_color = colors.EDGE_SELECTED
-                    else:
-                        edge_color = colors.EDGE_FULL
-
-                    dim_factor = 1.07
-                    dim_additive = 0.07
-                    if self.currently_hovered != None and self.currently_hovered[0] == 'edge' and self.currently_hovered[1] == utils.pair_to_string(other.id, grid[i][j].id):
-                        edge_color = (edge_color[0]*dim_factor+dim_additive, edge_color[1]*dim_factor+dim_additive, edge_color[2]*dim_factor+dim_additive)
-
-                        glColor3f(*edge_color)
-
-                        lx, ly, hx, hy = utils.make_thicker(lx, ly, hx, hy, 2)
-                        self.render_voxel(*self.to_camera(lx, ly), *self.to_camera(hx, hy))
+                if direction == 'r':
+                    other = utils.get_right(grid, node.id)
+                    if other == None or other.type == utils.CELL_EMPTY:
+                        continue
+                    lx, ly = ((x+1)*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
+                    hx, hy = (lx+self.border_thickness, ly+self.box_thickness+self.border_thickness*2)
+
+                if direction == 'u':
+                    other = utils.get_up(grid, node.id)
+                    if other == None or other.type == utils.CELL_EMPTY:
+                        continue
+                    lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
+                    hx, hy = (lx+self.box_thickness+self.border_thickness*2, ly+self.border_thickness)
+
+                if direction == 'd':
+                    other = utils.get_down(grid, node.id)
+                    if other == None or other.type == utils.CELL_EMPTY:
+                        continue
+                    lx, ly = (x*(self.border_thickness + self.box_thickness), (y+1)*(self.border_thickness + self.box_thickness))
+                    hx, hy = (lx+self.box_thickness+self.border_thickness*2, ly+self.border_thickness)
+
+                if not node.id in other.neighbors:
+                    edge_color = colors.EDGE_SELECTED
+                else:
+                    edge_color = colors.EDGE_FULL
+
+                edge = utils.pair_to_edge(other.id, node.id, grid_width)
+                if edge in bridges and direction in ['r', 'd']:
+                    glColor3f(*colors.EDGE_BRIDGE)
+                    self.render_voxel(*self.to_camera(lx, ly), *self.to_camera(hx, hy))
+
+                dim_factor = 1.07
+                dim_additive = 0.07
+                if self.currently_hovered != None and self.currently_hovered[0] == 'edge' and self.currently_hovered[1] == edge:
+                    edge_color = (edge_color[0]*dim_factor+dim_additive, edge_color[1]*dim_factor+dim_additive, edge_color[2]*dim_factor+dim_additive)
+
+                    glColor3f(*edge_color)
+
+                    lx, ly, hx, hy = utils.make_thicker(lx, ly, hx, hy, 2)
+                    self.render_voxel(*self.to_camera(lx, ly), *self.to_camera(hx, hy))
 
     def render_grid(self, grid, render_hover):
         grid_height = len(grid)
@@ -557,19 +667,21 @@ class Viewer:
 
         glEnd()
 
-        for i in range(grid_height):
-            for j in range(grid_width):
+        min_x, max_x, min_y, max_y = self.get_visible_range(grid_width, grid_height)
+        for i in range(min_y, max_y):
+            for j in range(min_x, max_x):
                 y = i
                 x = j
 
-                if grid[i][j].type != utils.CELL_EMPTY:
+                node = grid.get(j, i)
+                if node != None and node.type != utils.CELL_EMPTY:
                     continue
                 
                 voxel_color = colors.EMPTY_VOXEL
                 
                 dim_factor = 0.96
                 dim_additive = -0.05
-                if self.currently_hovered != None and self.currently_hovered[0] == 'node' and self.currently_hovered[2] == grid[i][j].id and render_hover:
+                if self.currently_hovered != None and self.currently_hovered[0] == 'node' and self.currently_hovered[2] == i*grid_width + j and render_hover:
                     voxel_color = (voxel_color[0]*dim_factor+dim_additive, voxel_color[1]*dim_factor+dim_additive, voxel_color[2]*dim_factor+dim_additive)
 
                 glColor3f(*voxel_color)
@@ -582,36 +694,239 @@ class Viewer:
         grid_height = len(grid)
         grid_width = len(grid[0])
 
-        for i in range(grid_height):
-            for j in range(grid_width):
-                y = i # grid_height - (i+1)
-                x = j
+        min_x, max_x, min_y, max_y = self.get_visible_range(grid_width, grid_height)
+        for j, i, node in grid.items_in(min_x, max_x, min_y, max_y):
+            y = i # grid_height - (i+1)
+            x = j
 
-                if grid[i][j].type == utils.CELL_EMPTY:
-                    continue
+            if node.type == utils.CELL_EMPTY:
+                continue
 
-                
-                if grid[i][j].type == utils.CELL_RIGID:
-                    voxel_color = colors.RIGID_VOXEL
-                if grid[i][j].type == utils.CELL_SOFT:
-                    voxel_color = colors.SOFT_VOXEL
-                if grid[i][j].type == utils.CELL_ACT_H:
-                    voxel_color = colors.ACT_H_VOXEL
-                if grid[i][j].type == utils.CELL_ACT_V:
-                    voxel_color = colors.ACT_V_VOXEL
-                if grid[i][j].type == utils.CELL_FIXED:
-                    voxel_color = colors.FIXED_VOXEL
-
-                dim_factor = 1.05
-                dim_additive = 0.07
-                if self.currently_hovered != None and self.currently_hovered[0] == 'node' and self.currently_hovered[2] == grid[i][j].id and render_hover:
-                    voxel_color = (voxel_color[0]*dim_factor+dim_additive, voxel_color[1]*dim_factor+dim_additive, voxel_color[2]*dim_factor+dim_additive)
+            
+            if node.type == utils.CELL_RIGID:
+                voxel_color = colors.RIGID_VOXEL
+            if node.type == utils.CELL_SOFT:
+                voxel_color = colors.SOFT_VOXEL
+            if node.type == utils.CELL_ACT_H:
+                voxel_color = colors.ACT_H_VOXEL
+            if node.type == utils.CELL_ACT_V:
+                voxel_color = colors.ACT_V_VOXEL
+            if node.type == utils.CELL_FIXED:
+                voxel_color = colors.FIXED_VOXEL
+
+            dim_factor = 1.05
+            dim_additive = 0.07
+            if self.currently_hovered != None and self.currently_hovered[0] == 'node' and self.currently_hovered[2] == node.id and render_hover:
+                voxel_color = (voxel_color[0]*dim_factor+dim_additive, voxel_color[1]*dim_factor+dim_additive, voxel_color[2]*dim_factor+dim_additive)
+
+            glColor3f(*voxel_color)
+            
+            lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
+            hx, hy = (lx+self.box_thickness+self.border_thickness, ly+self.box_thickness+self.border_thickness)
+            self.render_voxel(*self.to_camera(lx, ly), *self.to_camera(hx, hy))
 
-                glColor3f(*voxel_color)
-                
-                lx, ly = (x*(self.border_thickness + self.box_thickness), y*(self.border_thickness + self.box_thickness))
-                hx, hy = (lx+self.box_thickness+self.border_thickness, ly+self.box_thickness+self.border_thickness)
-                self.render_voxel(*self.to_camera(lx, ly), *self.to_camera(hx, hy))
+    def update_lod_texture(self, grid):
+        grid_height = len(grid)
+        grid_width = len(grid[0])
+
+        if self.lod_texture == None:
+            self.lod_texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.lod_texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+
+        if self.lod_dirty or self.lod_size != (grid_width, grid_height):
+            texels = self.lod_palette[utils.get_types(grid)]
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, grid_width, grid_height, 0, GL_RGB, GL_UNSIGNED_BYTE, texels)
+            self.lod_size = (grid_width, grid_height)
+            self.lod_dirty = False
+        else:
+            for index in self.lod_pending:
+                x, y = index%grid_width, index//grid_width
+                texel = self.lod_palette[grid.node_at(x, y).type]
+                glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, 1, 1, GL_RGB, GL_UNSIGNED_BYTE, texel)
+        self.lod_pending = {}
+
+    def render_lod(self, grid):
+        grid_height = len(grid)
+        grid_width = len(grid[0])
+
+        self.update_lod_texture(grid)
+
+        pwidth = self.border_thickness + grid_width*(self.border_thickness + self.box_thickness)
+        pheight = self.border_thickness + grid_height*(self.border_thickness + self.box_thickness)
+
+        glEnable(GL_TEXTURE_2D)
+        glTexEnvi(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_REPLACE)
+        glBegin(GL_QUADS)
+
+        glTexCoord2f(0, 0)
+        glVertex2f(*self.to_camera(0, 0))
+        glTexCoord2f(0, 1)
+        glVertex2f(*self.to_camera(0, pheight))
+        glTexCoord2f(1, 1)
+        glVertex2f(*self.to_camera(pwidth, pheight))
+        glTexCoord2f(1, 0)
+        glVertex2f(*self.to_camera(pwidth, 0))
+
+        glEnd()
+        glDisable(GL_TEXTURE_2D)
+
+    def get_minimap_rect(self,):
+        if self.grid_width == None:
+            return None
+
+        pitch = self.border_thickness + self.box_thickness
+        pwidth = self.border_thickness + self.grid_width*pitch
+        pheight = self.border_thickness + self.grid_height*pitch
+
+        # only needed while part of the grid is off screen
+        if pwidth*self.zoom <= self.res_width and pheight*self.zoom <= self.res_height:
+            return None
+
+        scale = self.minimap_size/max(pwidth, pheight)
+        hx, hy = self.res_width - self.minimap_margin, self.res_height - self.minimap_margin
+        return hx - pwidth*scale, hy - pheight*scale, hx, hy
+
+    def mouse_on_minimap(self,):
+        rect = self.get_minimap_rect()
+        if rect == None:
+            return False
+        mx, my = self.get_mouse_pos()
+        return mx >= rect[0] and mx <= rect[2] and my >= rect[1] and my <= rect[3]
+
+    def update_minimap_camera(self,):
+        if not self.minimap_held:
+            return
+        rect = self.get_minimap_rect()
+        if rect == None:
+            return
+
+        pitch = self.border_thickness + self.box_thickness
+        pwidth = self.border_thickness + self.grid_width*pitch
+        pheight = self.border_thickness + self.grid_height*pitch
+
+        mx, my = self.get_mouse_pos()
+        fx = min(max((mx - rect[0])/(rect[2] - rect[0]), 0), 1)
+        fy = min(max((my - rect[1])/(rect[3] - rect[1]), 0), 1)
+        self.cam_pos_x, self.cam_pos_y = fx*pwidth, fy*pheight
+
+    def render_minimap(self, grid):
+        rect = self.get_minimap_rect()
+        if rect == None:
+            return
+
+        def to_screen(px, py):
+            return px/self.res_width*2-1, -(py/self.res_height*2-1)
+
+        lx, ly, hx, hy = rect
+        glColor3f(*colors.GRID_COLOR)
+        self.render_voxel(*to_screen(lx-2, ly-2), *to_screen(hx+2, hy+2))
+
+        # only cells altered since the last upload are sent, same as for the LOD view
+        self.update_lod_texture(grid)
+        glEnable(GL_TEXTURE_2D)
+        glTexEnvi(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_REPLACE)
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 0)
+        glVertex2f(*to_screen(lx, ly))
+        glTexCoord2f(0, 1)
+        glVertex2f(*to_screen(lx, hy))
+        glTexCoord2f(1, 1)
+        glVertex2f(*to_screen(hx, hy))
+        glTexCoord2f(1, 0)
+        glVertex2f(*to_screen(hx, ly))
+        glEnd()
+        glDisable(GL_TEXTURE_2D)
+
+        pitch = self.border_thickness + self.box_thickness
+        pwidth = self.border_thickness + self.grid_width*pitch
+        pheight = self.border_thickness + self.grid_height*pitch
+        sx, sy = (hx-lx)/pwidth, (hy-ly)/pheight
+
+        half_width, half_height = self.res_width/(2*self.zoom), self.res_height/(2*self.zoom)
+        cx0 = min(max(lx + (self.cam_pos_x - half_width)*sx, lx), hx)
+        cx1 = min(max(lx + (self.cam_pos_x + half_width)*sx, lx), hx)
+        cy0 = min(max(ly + (self.cam_pos_y - half_height)*sy, ly), hy)
+        cy1 = min(max(ly + (self.cam_pos_y + half_height)*sy, ly), hy)
+
+        glColor3f(*colors.EDGE_SELECTED)
+        glBegin(GL_LINE_LOOP)
+        glVertex2f(*to_screen(cx0, cy0))
+        glVertex2f(*to_screen(cx1, cy0))
+        glVertex2f(*to_screen(cx1, cy1))
+        glVertex2f(*to_screen(cx0, cy1))
+        glEnd()
+
+    def render_symmetry(self, symmetry_axes):
+        axis_x, axis_y = symmetry_axes
+        if axis_x == None and axis_y == None:
+            return
+
+        pitch = self.border_thickness + self.box_thickness
+        pwidth = self.border_thickness + self.grid_width*pitch
+        pheight = self.border_thickness + self.grid_height*pitch
+        half = self.border_thickness/2
+
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glColor4f(*colors.SYMMETRY_AXIS)
+        if axis_x != None:
+            x = axis_x*pitch + self.border_thickness + self.box_thickness/2
+            self.render_voxel(*self.to_camera(x-half, 0), *self.to_camera(x+half, pheight))
+        if axis_y != None:
+            y = axis_y*pitch + self.border_thickness + self.box_thickness/2
+            self.render_voxel(*self.to_camera(0, y-half), *self.to_camera(pwidth, y+half))
+        glDisable(GL_BLEND)
+
+    def set_diff(self, diff):
+        self.diff = diff
+
+    def render_diff(self, grid):
+        if self.diff == None:
+            return
+
+        # the diff is aligned on the bottom left corner, so its extra rows are on top
+        grid_width, grid_height = len(grid[0]), len(grid)
+        top = self.diff.height - grid_height
+        if top < 0 or self.diff.width < grid_width:
+            return
+        pitch = self.border_thickness + self.box_thickness
+        min_x, max_x, min_y, max_y = self.get_visible_range(grid_width, grid_height)
+
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        cells = self.diff.cells[min_y+top:max_y+top, min_x:max_x]
+        for y, x in zip(*np.nonzero(cells)):
+            glColor4f(*colors.DIFF_COLORS[cells[y, x]])
+            lx, ly = (min_x+x)*pitch, (min_y+y)*pitch
+            self.render_voxel(*self.to_camera(lx, ly), *self.to_camera(lx + pitch + self.border_thickness, ly + pitch + self.border_thickness))
+
+        # flipped connections are drawn across the border they cross
+        glColor4f(*colors.DIFF_CONNECTION)
+        quarter = self.box_thickness/4
+        conn_h = self.diff.conn_h[min_y+top:max_y+top, min_x:max_x]
+        for y, x in zip(*np.nonzero(conn_h)):
+            lx, ly = (min_x+x+1)*pitch, (min_y+y)*pitch + self.border_thickness
+            self.render_voxel(*self.to_camera(lx - quarter, ly + quarter), *self.to_camera(lx + self.border_thickness + quarter, ly + self.box_thickness - quarter))
+        conn_v = self.diff.conn_v[min_y+top:max_y+top, min_x:max_x]
+        for y, x in zip(*np.nonzero(conn_v)):
+            lx, ly = (min_x+x)*pitch + self.border_thickness, (min_y+y+1)*pitch
+            self.render_voxel(*self.to_camera(lx + quarter, ly - quarter), *self.to_camera(lx + self.box_thickness - quarter, ly + self.border_thickness + quarter))
+        glDisable(GL_BLEND)
+
+    def render_region(self, region):
+        x0, y0, x1, y1 = region
+        pitch = self.border_thickness + self.box_thickness
+
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glColor4f(*colors.REGION_SELECTED)
+        self.render_voxel(*self.to_camera(x0*pitch, y0*pitch), *self.to_camera((x1+1)*pitch + self.border_thickness, (y1+1)*pitch + self.border_thickness))
+        glDisable(GL_BLEND)
 
     def render_voxel(self, lx, ly, hx, hy):
         glBegin(GL_QUADS)
@@ -621,6 +936,18 @@ class Viewer:
         glVertex2f(hx, ly)
         glEnd()
 
+    def get_visible_range(self, grid_width, grid_height):
+        pitch = self.border_thickness + self.box_thickness
+        half_width = self.res_width/(2*self.zoom)
+        half_height = self.res_height/(2*self.zoom)
+
+        # cells overlap their neighbours by one border, so pad the window by a cell on each side
+        min_x = max(0, int(math.floor((self.cam_pos_x - half_width)/pitch)) - 1)
+        max_x = min(grid_width, int(math.floor((self.cam_pos_x + half_width)/pitch)) + 1)
+        min_y = max(0, int(math.floor((self.cam_pos_y - half_height)/pitch)) - 1)
+        max_y = min(grid_height, int(math.floor((self.cam_pos_y + half_height)/pitch)) + 1)
+        return min_x, max_x, min_y, max_y
+
     def to_camera(self, x, y):
         px, py = 2*(x-self.cam_pos_x)*self.zoom/self.res_width, -2*(y-self.cam_pos_y)*self.zoom/self.res_height
         return (px, py)